@@ -0,0 +1,138 @@
+#!/bin/env python3
+# Player metrics from event logs written by events.FileSink, streamed in constant memory.
+import argparse
+import collections
+import sys
+from engine import Action, BitBoard, Event, row_masks
+from events import read_events
+from search import placements
+
+CLEAR_NAMES = {1: 'single', 2: 'double', 3: 'triple', 4: 'tetris'}
+
+# one locked piece: its frames, the inputs the player used and the fewest that
+# reach the same placement, and the combos it cleared
+Piece = collections.namedtuple('Piece', ['game', 'block_type', 'spawned', 'locked', 'inputs', 'fewest', 'clears'])
+
+def read_lines(files):
+    for file in files:
+        if file == '-':
+            yield from sys.stdin
+        else:
+            with open(file) as f:
+                yield from f
+
+def pieces(events):
+    """Pieces from the events of any number of games, each once its clears are known.
+
+    The board is rebuilt from the locks and garbage so the fewest inputs to
+    each placement can be searched from where the piece spawned.
+    """
+    game = -1
+    board = None
+    piece = None
+    spawn = None
+    inputs = 0
+    for event in events:
+        kind = event[1]
+        if kind in (Event.Spawn, Event.Start, Event.GameOver) and piece is not None:
+            yield piece
+            piece = None
+        if kind == Event.Start:
+            game += 1
+            board = BitBoard(event[3], event[4])
+        elif kind == Event.Spawn:
+            spawn = event
+            inputs = 0
+        elif kind == Event.Move and event[2] in (Action.MoveLeft, Action.MoveRight):
+            inputs += 1
+        elif kind == Event.Rotate:
+            inputs += 1
+        elif kind == Event.Lock and board is not None:
+            frame, kind, block_type, angle, x, y = event
+            piece = Piece(game, block_type, spawn[0], frame, inputs,
+                          fewest_inputs(board, block_type, (spawn[3], spawn[4]), angle, (x, y)), [])
+            board.place(block_type, angle, (x, y))
+            board.clear_lines()
+        elif kind == Event.LinesCleared and piece is not None:
+            piece.clears.append(event[2])
+        elif kind == Event.Garbage and board is not None:
+            board.add_garbage(event[2], event[3])
+    if piece is not None:
+        yield piece
+
+def fewest_inputs(board, block_type, spawn, angle, position):
+    """Fewest moves and turns from spawn to the placement, None if the search cannot reach it."""
+    cells = tuple((position[1] + dy, mask) for dy, mask in row_masks(board.width)[block_type][angle][position[0]])
+    # moving before the drop is enough for almost every placement, tucks and spins need the full search
+    for tucks in (False, True):
+        for placement in placements(board.rows, block_type, spawn, 0, board.width, tucks):
+            if placement.rows == cells:
+                return sum(1 for action in placement.path if action not in (Action.SoftDrop, Action.HardDrop))
+    return None
+
+class Metrics:
+    """Running totals over pieces, the same size however long the log."""
+
+    def __init__(self, fps=60) -> None:
+        self.fps = fps
+        self.games = 0
+        self.pieces = 0
+        self.frames = 0
+        self.faults = 0
+        self.extra_inputs = 0
+        self.searched = 0
+        self.faults_by_type = collections.Counter()
+        self.clears = collections.Counter()
+        self.game = None
+        self.game_start = 0
+        self.last_lock = 0
+
+    def add(self, piece) -> None:
+        if piece.game != self.game:
+            self.end_game()
+            self.game = piece.game
+            self.game_start = piece.spawned
+            self.games += 1
+        self.last_lock = piece.locked
+        self.pieces += 1
+        if piece.fewest is not None:
+            self.searched += 1
+            if piece.inputs > piece.fewest:
+                self.faults += 1
+                self.extra_inputs += piece.inputs - piece.fewest
+                self.faults_by_type[piece.block_type] += 1
+        for combo in piece.clears:
+            self.clears[combo] += 1
+
+    def end_game(self) -> None:
+        if self.game is not None:
+            self.frames += self.last_lock - self.game_start
+
+    def report(self) -> str:
+        self.end_game()
+        self.game = None
+        seconds = self.frames / self.fps
+        lines = ["{} games, {} pieces in {:.1f}s, {:.2f} pieces/s".format(
+            self.games, self.pieces, seconds, self.pieces / seconds if seconds else 0.0)]
+        lines.append("finesse faults: {} of {} pieces ({:.1f}%), {} extra inputs".format(
+            self.faults, self.searched, 100 * self.faults / self.searched if self.searched else 0.0,
+            self.extra_inputs))
+        total = sum(self.clears.values())
+        for combo in sorted(self.clears):
+            lines.append("{:>8}: {} ({:.1f}%)".format(
+                CLEAR_NAMES.get(combo, str(combo)), self.clears[combo], 100 * self.clears[combo] / total))
+        return '\n'.join(lines)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compute player metrics from event logs.")
+    parser.add_argument('files', nargs='+', help="event logs, - for standard input")
+    parser.add_argument('--fps', type=int, default=60, help="frames per second the games ran at")
+    args = parser.parse_args(argv)
+
+    metrics = Metrics(args.fps)
+    for piece in pieces(read_events(read_lines(args.files))):
+        metrics.add(piece)
+    print(metrics.report())
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,205 @@
+# Many independent games stepped in lockstep with NumPy.
+# Each action places the current piece: it is turned at the spawn position
+# with the same SRS kicks as Tetromino, shifted towards the target column
+# and hard dropped, as a player pressing those keys would.
+import numpy as np
+from engine import LINE_SCORES, PIECES
+
+# wall columns on each side of a row and rows above/below the board
+PAD = 3
+TOP = 4
+BOTTOM = 4
+# four rows of a bounding box are packed in one uint64, 16 bits per row
+LANE = 16
+
+def build_tables():
+    masks = np.zeros((8, 4, 4), dtype=np.uint64)
+    left = np.zeros((8, 4), dtype=np.int64)
+    kicks = np.zeros((2, 8, 4, 5, 2), dtype=np.int64)
+    for block_type in range(1, 8):
+        for angle, rotation in enumerate(PIECES[block_type]):
+            for dy, mask in rotation.rows:
+                masks[block_type, angle, dy] = mask
+            left[block_type, angle] = min(x for x, y in rotation.cells)
+            kicks[0, block_type, angle] = rotation.kicks_clockwise
+            kicks[1, block_type, angle] = rotation.kicks_counterclockwise
+    packed = (masks << (np.arange(4, dtype=np.uint64) * np.uint64(LANE))).sum(axis=2, dtype=np.uint64)
+    return masks, packed, left, kicks
+
+MASKS, PACKED_MASKS, LEFT, KICKS = build_tables()
+SCORES = np.array(LINE_SCORES + [LINE_SCORES[-1]] * 16, dtype=np.int64)
+
+def splitmix64(state):
+    """Advance per-game generator states in place and return the next outputs."""
+    with np.errstate(over='ignore'):
+        state += np.uint64(0x9E3779B97F4A7C15)
+        z = state.copy()
+        z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        return z ^ (z >> np.uint64(31))
+
+class BatchEnv:
+    """N games on one (N, height) array of row bitmasks, bit x set for an occupied column x.
+
+    Actions are angle * width + column, where column is the leftmost
+    occupied column of the piece once it lands. Holding is not available.
+    """
+    width: int = 10
+    height: int = 20
+
+    def __init__(self, n, width=10, height=20) -> None:
+        if width + 2 * PAD > LANE:
+            raise ValueError("BatchEnv supports boards up to {} columns".format(LANE - 2 * PAD))
+        self.n = n
+        self.width = width
+        self.height = height
+        self.full = (1 << width) - 1
+        self.walls = ((1 << PAD) - 1) | (((1 << PAD) - 1) << (PAD + width))
+        self.action_count = 4 * width
+        self.window = np.arange(4)
+        self.reset()
+
+    def reset(self, seeds=None) -> dict:
+        if seeds is None:
+            seeds = np.arange(self.n)
+        self.rng = np.asarray(seeds, dtype=np.uint64).copy()
+        rows = np.full((self.n, TOP + self.height + BOTTOM), self.walls, dtype='<u2')
+        rows[:, TOP + self.height:] = (1 << LANE) - 1
+        self.rows = rows
+        # every four consecutive rows read as one uint64, a zero-copy view
+        # that stays in sync with self.rows
+        self.windows = np.ndarray((self.n, rows.shape[1] - 3), dtype='<u8', buffer=rows,
+                                  strides=(rows.strides[0], rows.strides[1]))
+        self.score = np.zeros(self.n, dtype=np.int64)
+        self.level = np.ones(self.n, dtype=np.int64)
+        self.current_level_score = np.zeros(self.n, dtype=np.int64)
+        self.lines = np.zeros(self.n, dtype=np.int64)
+        self.pieces = np.zeros(self.n, dtype=np.int64)
+        self.done = np.zeros(self.n, dtype=bool)
+        self.current_piece = self.draw_piece()
+        self.next_piece = self.draw_piece()
+        return self.observe()
+
+    def draw_piece(self):
+        return (splitmix64(self.rng) % np.uint64(7)).astype(np.int64) + 1
+
+    def observe(self) -> dict:
+        board = (self.rows[:, TOP:TOP + self.height] >> np.uint16(PAD)) & np.uint16(self.full)
+        return {'board': board, 'piece': self.current_piece.copy(), 'next_piece': self.next_piece.copy()}
+
+    def collides(self, games, pieces, angle, x, y):
+        # past the left wall lane bits would shift out, anything past the
+        # right wall spills into the next row's left wall bits
+        shift = (x + PAD).clip(0).astype(np.uint64)
+        masks = PACKED_MASKS[pieces, angle] << shift
+        return ((self.windows[games, y + TOP] & masks) != 0) | (x + PAD < 0)
+
+    def turn(self, games, pieces, angle, x, y, direction, which) -> None:
+        """Turn the selected pieces in place, trying the SRS kicks in order."""
+        pending = np.flatnonzero(which)
+        for k in range(5):
+            if not pending.size:
+                break
+            p = pieces[pending]
+            a = angle[pending]
+            target = (a + (1 if direction == 0 else -1)) & 3
+            kick = KICKS[direction, p, a, k]
+            kx = x[pending] + kick[:, 0]
+            ky = y[pending] + kick[:, 1]
+            ok = ~self.collides(games[pending], p, target, kx, ky)
+            turned = pending[ok]
+            x[turned] = kx[ok]
+            y[turned] = ky[ok]
+            angle[turned] = target[ok]
+            pending = pending[~ok]
+
+    def shift(self, games, pieces, angle, x, y, target_x):
+        """Move pieces sideways towards target_x, stopping at the first blocked column."""
+        columns = np.arange(self.width + PAD)
+        masks = PACKED_MASKS[pieces, angle][:, None] << columns.astype(np.uint64)
+        # one blocked sentinel column on each side
+        blocked = np.ones((len(games), len(columns) + 2), dtype=bool)
+        blocked[:, 1:-1] = (self.windows[games, y + TOP][:, None] & masks) != 0
+        start = (x + PAD + 1)[:, None]
+        index = np.arange(blocked.shape[1])
+        right = (blocked & (index > start)).argmax(axis=1)
+        left = blocked.shape[1] - 1 - (blocked & (index < start))[:, ::-1].argmax(axis=1)
+        return np.clip(target_x + PAD + 1, left + 1, right - 1) - PAD - 1
+
+    def step(self, actions):
+        """Place the current piece of every running game, returns (observation, reward, done)."""
+        actions = np.asarray(actions, dtype=np.int64)
+        games = np.flatnonzero(~self.done)
+        pieces = self.current_piece[games]
+        actions = actions[games]
+        target_angle = actions // self.width
+        target_x = actions % self.width - LEFT[pieces, target_angle]
+
+        angle = np.zeros(len(games), dtype=np.int64)
+        x = np.full(len(games), self.width // 2 - 1, dtype=np.int64)
+        y = np.zeros(len(games), dtype=np.int64)
+        # angle 3 is one counterclockwise turn, the others turn clockwise
+        self.turn(games, pieces, angle, x, y, 1, target_angle == 3)
+        for i in range(2):
+            self.turn(games, pieces, angle, x, y, 0, (target_angle > i) & (target_angle != 3))
+        x = self.shift(games, pieces, angle, x, y, target_x)
+
+        # hard drop: first window below the piece that collides
+        masks = PACKED_MASKS[pieces, angle] << (x + PAD).astype(np.uint64)
+        windows = self.windows if games.size == self.n else self.windows[games]
+        hit = (windows & masks[:, None]) != 0
+        hit &= np.arange(hit.shape[1]) > (y + TOP)[:, None]
+        land = hit.argmax(axis=1) - 1
+        cells = games[:, None], land[:, None] + self.window
+        placed = self.rows[cells] | (MASKS[pieces, angle] << (x + PAD).astype(np.uint64)[:, None]).astype(np.uint16)
+        self.rows[cells] = placed
+        # cells above the top row are lost, as on the engine boards
+        self.rows[:, :TOP] = self.walls
+
+        # only the rows the piece landed in can have become full
+        full_row = np.uint16(self.walls | (self.full << PAD))
+        # the floor padding below the board is all ones too, so leave it out
+        inside = land[:, None] + self.window < TOP + self.height
+        cleared = ((placed == full_row) & inside).any(axis=1)
+        reward = np.zeros(self.n, dtype=np.int64)
+        reward[games[cleared]] = self.clear_lines(games[cleared])
+        self.pieces[games] += 1
+
+        self.current_piece[games] = self.next_piece[games]
+        self.next_piece[games] = self.draw_piece()[games]
+        spawn = self.windows[games, TOP]
+        masks = PACKED_MASKS[self.current_piece[games], 0] << np.uint64(self.width // 2 - 1 + PAD)
+        self.done[games] = (spawn & masks) != 0
+        return self.observe(), reward, self.done.copy()
+
+    def clear_lines(self, games):
+        """Clear full rows of the given games and return the score each of them gained."""
+        reward = np.zeros(len(games), dtype=np.int64)
+        full = self.rows[games, TOP:TOP + self.height] == np.uint16(self.walls | (self.full << PAD))
+        # as in Game.clear_lines a full top row is only cleared when it gets shifted down
+        full[:, 0] &= full[:, 1:].any(axis=1)
+        cleared = full.sum(axis=1)
+        hits = np.flatnonzero(cleared)
+        if hits.size:
+            full = full[hits]
+            # each run of adjacent full rows scores as one combo
+            run = np.zeros(hits.size, dtype=np.int64)
+            ends = full & ~np.pad(full[:, 1:], ((0, 0), (0, 1)))
+            for y in range(self.height):
+                run = np.where(full[:, y], run + 1, 0)
+                reward[hits] += np.where(ends[:, y], SCORES[run], 0)
+
+            # stable sort moves full rows to the top keeping the others in order
+            board = self.rows[games[hits], TOP:TOP + self.height]
+            order = np.argsort(~full, axis=1, kind='stable')
+            board = np.take_along_axis(board, order, axis=1)
+            board[np.arange(self.height) < cleared[hits, None]] = self.walls
+            self.rows[games[hits], TOP:TOP + self.height] = board
+
+        self.lines[games] += cleared
+        self.score[games] += reward
+        self.current_level_score[games] += reward
+        level_up = (self.current_level_score[games] > 10 * self.level[games]) & (self.level[games] < 20)
+        self.level[games[level_up]] += 1
+        self.current_level_score[games[level_up]] = 0
+        return reward
@@ -0,0 +1,22 @@
+#!/bin/env python3
+# Piece placements per second of the NumPy batch environment.
+# Run from the repository root: python3 -m benchmarks.batch
+import time
+import numpy as np
+from batch import BatchEnv
+
+def main():
+    rng = np.random.default_rng(0)
+    print('{:>8}{:>20}'.format('games', 'placements/s'))
+    for n in (1000, 10000, 50000):
+        env = BatchEnv(n)
+        actions = rng.integers(0, env.action_count, (20, n))
+        placed = 0
+        start = time.perf_counter()
+        for step in range(len(actions)):
+            placed += np.count_nonzero(~env.done)
+            env.step(actions[step])
+        print('{:>8}{:>20,.0f}'.format(n, placed / (time.perf_counter() - start)))
+
+if __name__ == '__main__':
+    main()
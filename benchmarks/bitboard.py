@@ -0,0 +1,67 @@
+#!/bin/env python3
+# Compare the list-of-lists board with the bitboard.
+# Run from the repository root: python3 -m benchmarks.bitboard
+import random
+import time
+import timeit
+from engine import BitBoard, CellBoard
+
+def random_rows(rng, height, width, full_rows):
+    rows = []
+    for y in range(height):
+        if y < height // 2:
+            rows.append([0] * width)
+        elif y in full_rows:
+            rows.append([1] * width)
+        else:
+            rows.append([rng.choice((0, 1, 1)) for x in range(width)])
+    return rows
+
+def make_board(cls, rows):
+    board = cls()
+    for y, row in enumerate(rows):
+        for x, c in enumerate(row):
+            if c:
+                if cls is CellBoard:
+                    board.cells[y][x] = 1
+                else:
+                    board.rows[y] |= 1 << x
+    return board
+
+def bench(stmt, number):
+    t = min(timeit.repeat(stmt, number=number, repeat=5))
+    return number / t
+
+def main():
+    rng = random.Random(0)
+    layout = random_rows(rng, 20, 10, ())
+    dense = random_rows(rng, 20, 10, (16, 17, 19))
+    queries = [(rng.randrange(1, 8), rng.randrange(4), (rng.randrange(-1, 9), rng.randrange(-2, 19)))
+               for i in range(1000)]
+
+    results = {}
+    for cls in (CellBoard, BitBoard):
+        board = make_board(cls, layout)
+
+        def intersections():
+            for q in queries:
+                board.intersects(*q)
+
+        def clears():
+            boards = [make_board(cls, dense) for i in range(200)]
+            start = time.perf_counter()
+            for b in boards:
+                b.clear_lines()
+            return time.perf_counter() - start
+
+        clear_rate = 200 / min(clears() for i in range(5))
+        results[cls.__name__] = (bench(intersections, 50) * len(queries), clear_rate)
+
+    print('{:<12}{:>16}{:>16}'.format('board', 'intersects/s', 'clear_lines/s'))
+    for name, (inter, clear) in results.items():
+        print('{:<12}{:>16,.0f}{:>16,.0f}'.format(name, inter, clear))
+    cell, bit = results['CellBoard'], results['BitBoard']
+    print('speedup     {:>15.1f}x{:>15.1f}x'.format(bit[0] / cell[0], bit[1] / cell[1]))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+#!/bin/env python3
+# How the engine and the renderer scale with the board size.
+# Run from the repository root: python3 -m benchmarks.boardsize
+import os
+import random
+import time
+from engine import BitBoard, BlockType, CellBoard, Game, TickClock, Tetromino
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+SIZES = ((10, 20), (25, 50), (50, 100), (100, 200))
+
+def frames_per_second(cls, width, height, frames=20000):
+    """Game.update calls per second with random inputs, restarting games that end."""
+    rng = random.Random(0)
+    inputs = [[rng.randrange(1, 8)] if rng.random() < 0.2 else [] for i in range(frames)]
+    game = Game(cls(width, height), seed=0, record=False, clock=TickClock())
+    start = time.perf_counter()
+    for actions in inputs:
+        if not game.going:
+            game = Game(cls(width, height), seed=0, record=False, clock=TickClock())
+        game.update(actions)
+    return frames / (time.perf_counter() - start)
+
+def clear_seconds(cls, width, height, repeat=200):
+    """Seconds to lock an I piece that clears four lines of a half full board."""
+    rng = random.Random(0)
+    total = 0.0
+    for i in range(repeat):
+        game = Game(cls(width, height), seed=0, record=False, clock=TickClock())
+        for y in range(height // 2, height):
+            for x in range(1, width):
+                if y >= height - 4 or rng.random() < 0.7:
+                    if cls is CellBoard:
+                        game.board.cells[y][x] = BlockType.J
+                    else:
+                        game.board.rows[y] |= 1 << x
+        game.board.update_tops()
+        # vertical I piece in column 0, its cells are at x + 2
+        game.current_piece = Tetromino(BlockType.I, (-2, height - 4), 1)
+        start = time.perf_counter()
+        game.lock_piece()
+        total += time.perf_counter() - start
+        assert game.lines == 4
+    return total / repeat
+
+def repaint_seconds(width, height, frames=2000):
+    """Seconds per frame of Playfield.update and repaint while playing, None without pygame."""
+    try:
+        import pygame
+        from tetris import Playfield
+    except ImportError:
+        return None
+    pygame.display.init()
+    pygame.display.set_mode((width * 4, height * 4))
+    playfield = Playfield(Game(CellBoard(width, height), seed=0, record=False, clock=TickClock()), 4)
+    rng = random.Random(0)
+    keys = [pygame.K_a, pygame.K_d, pygame.K_q, pygame.K_SPACE]
+    events = [[pygame.event.Event(pygame.KEYDOWN, key=rng.choice(keys))] if rng.random() < 0.2 else []
+              for i in range(frames)]
+    start = time.perf_counter()
+    for frame_events in events:
+        if not playfield.game.going:
+            playfield.game = Game(CellBoard(width, height), seed=0, record=False, clock=TickClock())
+        playfield.update(frame_events)
+        playfield.repaint()
+    return (time.perf_counter() - start) / frames
+
+def main():
+    print('{:<10}{:>14}{:>14}{:>14}{:>14}{:>14}'.format(
+        'board', 'cell fps', 'bit fps', 'cell clear', 'bit clear', 'repaint'))
+    for width, height in SIZES:
+        repaint = repaint_seconds(width, height)
+        print('{:<10}{:>14,.0f}{:>14,.0f}{:>12.1f}us{:>12.1f}us{:>14}'.format(
+            '{}x{}'.format(width, height),
+            frames_per_second(CellBoard, width, height), frames_per_second(BitBoard, width, height),
+            clear_seconds(CellBoard, width, height) * 1e6, clear_seconds(BitBoard, width, height) * 1e6,
+            '{:.1f}us'.format(repaint * 1e6) if repaint is not None else 'no pygame'))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,290 @@
+#!/bin/env python3
+# Benchmarks of the engine hot paths and rendering, compared with checked-in baselines.
+# Run from the repository root: python3 -m benchmarks.run [--update-baseline]
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+from engine import BitBoard, CellBoard, Game, TickClock, Tetromino
+
+BASELINE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+BENCHMARKS = {}
+# slowest ops/s a benchmark may run at, whatever the baseline says
+TARGETS = {}
+
+def benchmark(name, target=None):
+    """Register a function that sets up a case and returns the operation to time."""
+    def register(setup):
+        BENCHMARKS[name] = setup
+        if target is not None:
+            TARGETS[name] = target
+        return setup
+    return register
+
+def fill(board, rng, full_rows=(), top=10):
+    """Fill the rows below top at random, leaving one hole per row unless the row is in full_rows."""
+    for y in range(top, board.height):
+        hole = -1 if y in full_rows else rng.randrange(board.width)
+        for x in range(board.width):
+            if x != hole and (y in full_rows or rng.random() < 0.7):
+                if isinstance(board, CellBoard):
+                    board.cells[y][x] = rng.randrange(1, 8)
+                else:
+                    board.rows[y] |= 1 << x
+    board.update_tops()
+    return board
+
+def intersection_case(board):
+    rng = random.Random(0)
+    fill(board, rng)
+    queries = [(Tetromino(rng.randrange(1, 8), (0, 0), rng.randrange(4)),
+                (rng.randrange(-1, board.width - 1), rng.randrange(-1, board.height - 1)))
+               for i in range(256)]
+    state = [0]
+
+    def op():
+        piece, position = queries[state[0] & 255]
+        state[0] += 1
+        piece.check_intersection(position, board)
+    return op
+
+@benchmark('check_intersection.cellboard')
+def check_intersection_cellboard():
+    return intersection_case(CellBoard())
+
+@benchmark('check_intersection.bitboard')
+def check_intersection_bitboard():
+    return intersection_case(BitBoard())
+
+def ghost_case(board):
+    game = Game(board, seed=0, record=False)
+    fill(game.board, random.Random(0))
+    return game.calc_ghost
+
+@benchmark('calc_ghost.cellboard')
+def calc_ghost_cellboard():
+    return ghost_case(CellBoard())
+
+@benchmark('calc_ghost.bitboard')
+def calc_ghost_bitboard():
+    return ghost_case(BitBoard())
+
+@benchmark('clear_lines.cellboard')
+def clear_lines_cellboard():
+    # four separate full rows on a dense board, restored before every clear
+    template = fill(CellBoard(), random.Random(0), full_rows=(12, 15, 16, 19), top=4)
+    board = CellBoard()
+
+    def op():
+        board.cells = [row[:] for row in template.cells]
+        board.tops = template.tops[:]
+        board.clear_lines()
+    return op
+
+@benchmark('clear_lines.bitboard')
+def clear_lines_bitboard():
+    template = fill(BitBoard(), random.Random(0), full_rows=(12, 15, 16, 19), top=4)
+    board = BitBoard()
+
+    def op():
+        board.rows = template.rows[:]
+        board.tops = template.tops[:]
+        board.clear_lines()
+    return op
+
+@benchmark('tetromino.spawn')
+def tetromino_spawn():
+    return lambda: Tetromino(3, (4, -1))
+
+def update_case(board_type):
+    rng = random.Random(0)
+    inputs = [[rng.randrange(1, 8)] if rng.random() < 0.1 else [] for i in range(4096)]
+    state = {'game': None, 'frame': 0}
+
+    def op():
+        game = state['game']
+        if game is None or not game.going:
+            game = state['game'] = Game(board_type(), seed=state['frame'], record=False, clock=TickClock())
+        game.update(inputs[state['frame'] & 4095])
+        state['frame'] += 1
+    return op
+
+@benchmark('game.update')
+def game_update():
+    return update_case(CellBoard)
+
+@benchmark('game.update.bitboard')
+def game_update_bitboard():
+    return update_case(BitBoard)
+
+def midgame():
+    game = Game(BitBoard(), seed=0, record=False)
+    fill(game.board, random.Random(0))
+    return game
+
+@benchmark('game.clone')
+def game_clone():
+    return midgame().clone
+
+@benchmark('game.snapshot')
+def game_snapshot():
+    game = midgame()
+    buffer = bytearray(len(game.snapshot()))
+    return lambda: game.snapshot_into(buffer)
+
+@benchmark('game.from_snapshot')
+def game_from_snapshot():
+    data = midgame().snapshot()
+    return lambda: Game.from_snapshot(data, board=BitBoard())
+
+# a bot searches every piece with tucks on, so one search has to take well under a millisecond
+@benchmark('search.placements', target=1000)
+def search_placements():
+    from search import placements
+    board = fill(BitBoard(), random.Random(0))
+    rows = tuple(board.rows)
+    return lambda: placements(rows, 3, (4, 0), tucks=True)
+
+@benchmark('search.placements.empty', target=1000)
+def search_placements_empty():
+    from search import placements
+    rows = tuple(BitBoard().rows)
+    return lambda: placements(rows, 1, (4, 0), tucks=True)
+
+@benchmark('simulate.game')
+def simulate_game():
+    from simulate import play_game
+    state = [0]
+
+    def op():
+        play_game(state[0], 'random', 10000)
+        state[0] += 1
+    return op
+
+def pygame_playfield():
+    import pygame
+    from tetris import Playfield
+    pygame.display.init()
+    pygame.display.set_mode((512, 640))
+    return Playfield(Game(seed=0, record=False, clock=TickClock()))
+
+@benchmark('playfield.update')
+def playfield_update():
+    import pygame
+    playfield = pygame_playfield()
+    rng = random.Random(0)
+    keys = [pygame.K_a, pygame.K_d, pygame.K_q, pygame.K_e, pygame.K_s, pygame.K_SPACE]
+    events = [[pygame.event.Event(pygame.KEYDOWN, key=rng.choice(keys))] if rng.random() < 0.1 else []
+              for i in range(4096)]
+    state = [0]
+
+    def op():
+        if not playfield.game.going:
+            playfield.game = Game(seed=state[0], record=False, clock=TickClock())
+        playfield.update(events[state[0] & 4095])
+        playfield.repaint()
+        state[0] += 1
+    return op
+
+@benchmark('playfield.repaint.full')
+def playfield_repaint_full():
+    playfield = pygame_playfield()
+
+    def op():
+        playfield.invalidate()
+        playfield.repaint()
+    return op
+
+@benchmark('playfield.repaint.idle')
+def playfield_repaint_idle():
+    return pygame_playfield().repaint
+
+def measure(op, min_time):
+    """Best ops/s over five runs and the average bytes allocated at peak by one op."""
+    op()
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for i in range(number):
+            op()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time / 5:
+            break
+        number *= 2
+    best = elapsed
+    for run in range(4):
+        start = time.perf_counter()
+        for i in range(number):
+            op()
+        best = min(best, time.perf_counter() - start)
+
+    samples = min(number, 200)
+    tracemalloc.start()
+    allocated = 0
+    for i in range(samples):
+        tracemalloc.reset_peak()
+        current = tracemalloc.get_traced_memory()[0]
+        op()
+        allocated += tracemalloc.get_traced_memory()[1] - current
+    tracemalloc.stop()
+    return number / best, allocated / samples
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the benchmarks and compare them with the baseline.")
+    parser.add_argument('names', nargs='*', help="benchmarks to run, prefixes match")
+    parser.add_argument('--time', type=float, default=1.0, help="seconds to spend per benchmark")
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help="flag benchmarks slower than the baseline by more than this fraction")
+    parser.add_argument('--update-baseline', action='store_true')
+    args = parser.parse_args(argv)
+
+    baseline = {}
+    if os.path.exists(BASELINE):
+        with open(BASELINE) as f:
+            baseline = json.load(f)
+
+    results = {}
+    regressions = []
+    print('{:<28}{:>14}{:>14}{:>12}'.format('benchmark', 'ops/s', 'alloc B/op', 'vs base'))
+    for name, setup in BENCHMARKS.items():
+        if args.names and not any(name.startswith(n) for n in args.names):
+            continue
+        try:
+            op = setup()
+        except ImportError as e:
+            print('{:<28}  skipped: {}'.format(name, e))
+            continue
+        rate, allocated = measure(op, args.time)
+        results[name] = {'ops_per_sec': rate, 'alloc_bytes_per_op': allocated}
+        compare = ''
+        if name in baseline:
+            ratio = rate / baseline[name]['ops_per_sec']
+            compare = '{:.2f}x'.format(ratio)
+            if ratio < 1 - args.threshold:
+                compare += ' !'
+                regressions.append(name)
+        if rate < TARGETS.get(name, 0):
+            compare += ' < {:,}'.format(TARGETS[name])
+            if name not in regressions:
+                regressions.append(name)
+        print('{:<28}{:>14,.0f}{:>14,.0f}{:>12}'.format(name, rate, allocated, compare))
+
+    if args.update_baseline:
+        baseline.update(results)
+        with open(BASELINE, 'w') as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write('\n')
+    if regressions:
+        print('regressions over {:.0%} or under target: {}'.format(args.threshold, ', '.join(regressions)))
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,953 @@
+# Headless game logic, no pygame required.
+# https://tetris.fandom.com/wiki/Tetris_Guideline
+import bisect
+import copy
+import math
+import random
+import struct
+import time
+from collections import namedtuple
+
+class BlockType:
+    Empty = 0
+    I = 1
+    O = 2
+    T = 3
+    S = 4
+    Z = 5
+    J = 6
+    L = 7
+    # lines sent by an opponent in versus games, see server.py
+    Garbage = 8
+
+class Action:
+    RotateClockwise = 1
+    RotateCounterclockwise = 2
+    MoveLeft = 3
+    MoveRight = 4
+    SoftDrop = 5
+    HardDrop = 6
+    Hold = 7
+    # applied by Game.update when the gravity and lock timers run out
+    Gravity = 8
+    Lock = 9
+
+# kinds of the events a Game passes to its listener as (frame, kind, *values),
+# the values of each are named in events.FIELDS
+class Event:
+    Start = 1
+    Spawn = 2
+    Move = 3
+    Rotate = 4
+    Lock = 5
+    LinesCleared = 6
+    LevelUp = 7
+    Hold = 8
+    Garbage = 9
+    GameOver = 10
+
+LINE_SCORES = [0, 1, 3, 5, 8]
+# seeds are stored as uint64 in replays and snapshots
+SEED_LIMIT = 1 << 64
+
+SHAPES = {
+    BlockType.I: {
+        0: 0b0000111100000000,
+        1: 0b0010001000100010,
+        2: 0b0000000011110000,
+        3: 0b0100010001000100},
+    BlockType.O: {
+        0: 0b1111,
+        1: 0b1111,
+        2: 0b1111,
+        3: 0b1111},
+    BlockType.T: {
+        0: 0b010111000,
+        1: 0b010011010,
+        2: 0b000111010,
+        3: 0b010110010},
+    BlockType.S: {
+        0: 0b011110000,
+        1: 0b010011001,
+        2: 0b000011110,
+        3: 0b100110010},
+    BlockType.Z: {
+        0: 0b110011000,
+        1: 0b001011010,
+        2: 0b000110011,
+        3: 0b010110100},
+    BlockType.J: {
+        0: 0b100111000,
+        1: 0b011010010,
+        2: 0b000111001,
+        3: 0b010010110},
+    BlockType.L: {
+        0: 0b001111000,
+        1: 0b010010011,
+        2: 0b000111100,
+        3: 0b110010010}}
+
+BB_DIMS = {
+    BlockType.I: (4, 4),
+    BlockType.O: (2, 2),
+    BlockType.T: (3, 3),
+    BlockType.S: (3, 3),
+    BlockType.Z: (3, 3),
+    BlockType.J: (3, 3),
+    BlockType.L: (3, 3)}
+
+# SRS wall kicks per starting angle, tested in order
+KICKS_CLOCKWISE = [[(0, 0), (-1, 0), (-1, 1),(0, -2), (-1, -2)],
+                   [(0, 0), (1, 0), (1, -1), (0, 2), (1, 2)],
+                   [(0, 0), (1, 0), (1, 1), (0, -2), (1, -2)],
+                   [(0, 0), (-1, 0), (-1, -1), (0, 2), (-1, 2)]]
+KICKS_COUNTERCLOCKWISE = [[(0, 0), (1, 0), (1, 1), (0, -2), (1, -2)],
+                          [(0, 0), (1, 0), (1, -1), (0, 2), (1, 2)],
+                          [(0, 0), (-1, 0), (-1, 1), (0, -2), (-1, -2)],
+                          [(0, 0), (-1, 0), (-1,-1), (0, 2), (-1, 2)]]
+KICKS_I_CLOCKWISE = [[(0, 0), (-2, 0), (1, 0), (-2, -1), (1, 2)],
+                     [(0, 0), (-1, 0), (2, 0), (-1, 2), (2, -1)],
+                     [(0, 0), (2, 0), (-1, 0), (2, 1), (-1, -2)],
+                     [(0, 0), (1, 0), (-2, 0), (1, -2), (-2, 1)]]
+KICKS_I_COUNTERCLOCKWISE = [[(0, 0), (-1, 0), (2, 0), (-1, 2), ( 2, -1)],
+                            [(0, 0), (2, 0), (-1, 0), (2, 1), (-1, -2)],
+                            [(0, 0), (1, 0), (-2, 0), (1, -2), (-2, 1)],
+                            [(0, 0), (-2, 0), (1, 0), (-2, -1), (1, 2)]]
+
+Rotation = namedtuple('Rotation', ['shape', 'dim', 'cells', 'rows', 'columns',
+                                   'kicks_clockwise', 'kicks_counterclockwise'])
+
+def shape_cells(block_type, angle):
+    """Occupied (x, y) offsets of a rotation inside its bounding box."""
+    w, h = BB_DIMS[block_type]
+    r = SHAPES[block_type][angle]
+    return tuple((x, y) for y in range(h) for x in range(w)
+                 if (r >> ((h - y - 1) * w + w - x - 1)) & 1)
+
+def shape_rows(block_type, angle):
+    """Non-empty rows of a rotation as (dy, mask) with bit x set for bounding box column x."""
+    masks = {}
+    for x, y in shape_cells(block_type, angle):
+        masks[y] = masks.get(y, 0) | (1 << x)
+    return tuple(sorted(masks.items()))
+
+def shape_columns(block_type, angle):
+    """Occupied columns of a rotation as (dx, top dy, bottom dy)."""
+    columns = {}
+    for x, y in shape_cells(block_type, angle):
+        top, bottom = columns.get(x, (y, y))
+        columns[x] = (min(top, y), max(bottom, y))
+    return tuple((x, top, bottom) for x, (top, bottom) in sorted(columns.items()))
+
+def build_rotations(block_type):
+    if block_type == BlockType.I:
+        clockwise, counterclockwise = KICKS_I_CLOCKWISE, KICKS_I_COUNTERCLOCKWISE
+    else:
+        clockwise, counterclockwise = KICKS_CLOCKWISE, KICKS_COUNTERCLOCKWISE
+    # subtract rules position because playfield is reversed
+    return tuple(Rotation(SHAPES[block_type][angle],
+                          BB_DIMS[block_type],
+                          shape_cells(block_type, angle),
+                          shape_rows(block_type, angle),
+                          shape_columns(block_type, angle),
+                          tuple((-x, -y) for x, y in clockwise[angle]),
+                          tuple((-x, -y) for x, y in counterclockwise[angle]))
+                 for angle in range(4))
+
+# PIECES[block_type][angle], built once and shared by every Tetromino
+PIECES = (None,) + tuple(build_rotations(block_type) for block_type in range(1, 8))
+
+class Tetromino:
+    __slots__ = ('block_type', 'position', 'angle')
+
+    def __init__(self, block_type, position, angle=0) -> None:
+        self.block_type = block_type
+        self.position = position
+        self.angle = angle
+
+    def drop(self) -> None:
+        self.position = (self.position[0], self.position[1] + 1)
+
+    def try_turn_clockwise(self, board):
+        angle = (self.angle + 1) & 3
+        for dx, dy in PIECES[self.block_type][self.angle].kicks_clockwise:
+            pos = (self.position[0] + dx, self.position[1] + dy)
+            if not board.intersects(self.block_type, angle, pos):
+                self.position = pos
+                self.angle = angle
+                return True
+        return False
+
+    def try_turn_counterclockwise(self, board):
+        angle = (self.angle - 1) & 3
+        for dx, dy in PIECES[self.block_type][self.angle].kicks_counterclockwise:
+            pos = (self.position[0] + dx, self.position[1] + dy)
+            if not board.intersects(self.block_type, angle, pos):
+                self.position = pos
+                self.angle = angle
+                return True
+        return False
+
+    def turn_clockwise(self, angle=None) -> None:
+        if angle is None:
+            angle = self.angle
+        return (angle + 1) & 3
+
+    def turn_counterclockwise(self, angle=None) -> None:
+        if angle is None:
+            angle = self.angle
+        return (angle - 1) & 3
+
+    def move_left(self):
+        self.position = (self.position[0] - 1, self.position[1])
+
+    def move_right(self):
+        self.position = (self.position[0] + 1, self.position[1])
+
+    def get_bb_dim(self):
+        return PIECES[self.block_type][self.angle].dim
+
+    def int_repr(self) -> int:
+        return PIECES[self.block_type][self.angle].shape
+
+    def cells(self):
+        return PIECES[self.block_type][self.angle].cells
+
+    def check_grounded(self, board) -> bool:
+        return board.intersects(self.block_type, self.angle, (self.position[0], self.position[1] + 1))
+
+    def check_intersection(self, position, board, angle=None):
+        if angle is None:
+            angle = self.angle
+        return board.intersects(self.block_type, angle, position)
+
+_row_masks_cache = {}
+
+def row_masks(width):
+    """Per (block type, angle, x) row masks of every in-bounds column position."""
+    if width not in _row_masks_cache:
+        table = {}
+        for block_type in range(1, 8):
+            table[block_type] = {}
+            for angle in range(4):
+                rows = PIECES[block_type][angle].rows
+                used = 0
+                for dy, mask in rows:
+                    used |= mask
+                left = (used & -used).bit_length() - 1
+                right = used.bit_length() - 1
+                table[block_type][angle] = {
+                    x: tuple((dy, mask << x if x >= 0 else mask >> -x) for dy, mask in rows)
+                    for x in range(-left, width - right)}
+        _row_masks_cache[width] = table
+    return _row_masks_cache[width]
+
+# SPREAD[bits] has a garbage cell in nibble x for each bit x of five columns
+SPREAD = tuple(sum(BlockType.Garbage << (4 * x) for x in range(5) if (bits >> x) & 1) for bits in range(32))
+
+def full_rows_to_clear(full):
+    """Rows clear_lines removes out of the full rows, in ascending order.
+
+    A full top row is only removed along with rows below it, as the
+    original scan from the bottom stopped at row 1 and only reached it
+    once it had been shifted down.
+    """
+    return full if full != [0] else []
+
+def line_combos(cleared):
+    """Number of rows in each run of adjacent cleared rows, from the bottom up."""
+    combos = []
+    for i, y in enumerate(reversed(cleared)):
+        if i and y == cleared[-i] - 1:
+            combos[-1] += 1
+        else:
+            combos.append(1)
+    return combos
+
+def lower_tops(board, cleared) -> None:
+    """Update board.tops after the full rows in cleared, in ascending order, were removed."""
+    first = cleared[0]
+    gone = set(cleared)
+    tops = board.tops
+    for x, top in enumerate(tops):
+        # full rows span every column, so no column's top is below the first
+        if top < first:
+            tops[x] = top + len(cleared)
+            continue
+        # the top was cleared, the new one is at or below where the first
+        # row left under it moved to
+        r = top
+        while r in gone:
+            r += 1
+        y = r + len(cleared) - bisect.bisect_right(cleared, r)
+        while y < board.height and board.is_empty(x, y):
+            y += 1
+        tops[x] = y
+
+def raise_tops(tops, rotation, position) -> None:
+    """Update a board's column tops for a piece placed at position."""
+    px, py = position
+    for dx, top, bottom in rotation.columns:
+        if py + bottom >= 0 and max(py + top, 0) < tops[px + dx]:
+            tops[px + dx] = max(py + top, 0)
+
+def landing_row(tops, rotation, position):
+    """Row a piece dropped straight down from position lands on, from the column tops.
+
+    Returns None when part of the piece is below the top of its column,
+    under an overhang, or outside the board, where only scanning the board
+    finds the landing row.
+    """
+    px, py = position
+    landing = None
+    for dx, top, bottom in rotation.columns:
+        if not 0 <= px + dx < len(tops):
+            return None
+        surface = tops[px + dx] - 1 - bottom
+        if surface < py:
+            return None
+        if landing is None or surface < landing:
+            landing = surface
+    return landing
+
+class CellBoard:
+    """Board as a list of rows holding the block type of each cell."""
+
+    def __init__(self, width=10, height=20) -> None:
+        self.width = width
+        self.height = height
+        self.cells = [[BlockType.Empty] * width for i in range(height)]
+        # row of the highest occupied cell of each column, height when empty
+        self.tops = [height] * width
+        # counts changes to the cells, so renderers can skip unchanged boards
+        self.changes = 0
+
+    def update_tops(self) -> None:
+        """Recompute tops, needed after editing cells directly."""
+        self.tops = [next((y for y in range(self.height) if self.cells[y][x] != BlockType.Empty), self.height)
+                     for x in range(self.width)]
+        self.changes += 1
+
+    def column_heights(self) -> list:
+        return [self.height - top for top in self.tops]
+
+    def copy(self):
+        board = copy.copy(self)
+        board.cells = [row[:] for row in self.cells]
+        board.tops = self.tops[:]
+        return board
+
+    def pack(self) -> int:
+        """The board as one int with the block type of cell (x, y) at bit 4 * (y * width + x)."""
+        packed = 0
+        for row in reversed(self.cells):
+            for c in reversed(row):
+                packed = (packed << 4) | c
+        return packed
+
+    def unpack(self, packed) -> None:
+        for y in range(self.height):
+            for x in range(self.width):
+                self.cells[y][x] = (packed >> (4 * (y * self.width + x))) & 0xF
+        self.update_tops()
+
+    def is_empty(self, x, y) -> bool:
+        return self.cells[y][x] == BlockType.Empty
+
+    def row_bits(self) -> list:
+        """Rows as ints with bit x set for an occupied column x."""
+        return [sum(1 << x for x, c in enumerate(row) if c != BlockType.Empty) for row in self.cells]
+
+    def intersects(self, block_type, angle, position) -> bool:
+        px, py = position
+        for x, y in PIECES[block_type][angle].cells:
+            x += px
+            y += py
+            if x < 0 or x >= self.width or y >= self.height:
+                return True
+            elif y >= 0 and self.cells[y][x] != BlockType.Empty:
+                return True
+        return False
+
+    def place(self, block_type, angle, position) -> None:
+        rotation = PIECES[block_type][angle]
+        for x, y in rotation.cells:
+            # cells above the top row are lost instead of wrapping to the bottom
+            if y + position[1] >= 0:
+                self.cells[y + position[1]][x + position[0]] = block_type
+        raise_tops(self.tops, rotation, position)
+        self.changes += 1
+
+    def clear_lines(self, rows=None) -> list:
+        """Remove full rows and return the number of rows cleared at each height.
+
+        Only the given rows are checked, all of them by default.
+        """
+        candidates = range(self.height) if rows is None else set(rows)
+        full = full_rows_to_clear(sorted(y for y in candidates if BlockType.Empty not in self.cells[y]))
+        if not full:
+            return []
+        for y in reversed(full):
+            del self.cells[y]
+        self.cells[:0] = [[BlockType.Empty] * self.width for y in full]
+        lower_tops(self, full)
+        self.changes += 1
+        return line_combos(full)
+
+    def add_garbage(self, count, hole) -> None:
+        """Push the board up by count rows full except for column hole."""
+        row = [BlockType.Garbage] * self.width
+        row[hole] = BlockType.Empty
+        self.cells = self.cells[count:] + [row[:] for i in range(count)]
+        self.update_tops()
+
+class BitBoard:
+    """Compact board storing each row as an int with bit x set for an occupied column x."""
+
+    def __init__(self, width=10, height=20) -> None:
+        self.width = width
+        self.height = height
+        self.full = (1 << width) - 1
+        self.rows = [0] * height
+        self.masks = row_masks(width)
+        # row of the highest occupied cell of each column, height when empty
+        self.tops = [height] * width
+        # counts changes to the rows, so renderers can skip unchanged boards
+        self.changes = 0
+
+    def update_tops(self) -> None:
+        """Recompute tops, needed after editing rows directly."""
+        tops = [self.height] * self.width
+        seen = 0
+        for y, row in enumerate(self.rows):
+            new = row & ~seen
+            while new:
+                low = new & -new
+                tops[low.bit_length() - 1] = y
+                new ^= low
+            seen |= row
+            if seen == self.full:
+                break
+        self.tops = tops
+        self.changes += 1
+
+    def column_heights(self) -> list:
+        return [self.height - top for top in self.tops]
+
+    def copy(self):
+        board = copy.copy(self)
+        board.rows = self.rows[:]
+        board.tops = self.tops[:]
+        return board
+
+    def pack(self) -> int:
+        """The board as one int with the block type of cell (x, y) at bit 4 * (y * width + x).
+
+        Block types are not kept, occupied cells are stored as garbage.
+        """
+        packed = 0
+        for row in reversed(self.rows):
+            cells = 0
+            for shift in range(0, self.width, 5):
+                cells |= SPREAD[(row >> shift) & 0x1F] << (4 * shift)
+            packed = (packed << (4 * self.width)) | cells
+        return packed
+
+    def unpack(self, packed) -> None:
+        row_mask = (1 << (4 * self.width)) - 1
+        for y in range(self.height):
+            cells = (packed >> (4 * self.width * y)) & row_mask
+            row = 0
+            x = 0
+            while cells:
+                if cells & 0xF:
+                    row |= 1 << x
+                cells >>= 4
+                x += 1
+            self.rows[y] = row
+        self.update_tops()
+
+    def is_empty(self, x, y) -> bool:
+        return not (self.rows[y] >> x) & 1
+
+    def row_bits(self) -> list:
+        """Rows as ints with bit x set for an occupied column x."""
+        return list(self.rows)
+
+    def intersects(self, block_type, angle, position) -> bool:
+        masks = self.masks[block_type][angle].get(position[0])
+        if masks is None:
+            return True
+        rows = self.rows
+        for dy, mask in masks:
+            y = position[1] + dy
+            if y >= self.height:
+                return True
+            if y >= 0 and rows[y] & mask:
+                return True
+        return False
+
+    def place(self, block_type, angle, position) -> None:
+        for dy, mask in self.masks[block_type][angle][position[0]]:
+            if position[1] + dy >= 0:
+                self.rows[position[1] + dy] |= mask
+        raise_tops(self.tops, PIECES[block_type][angle], position)
+        self.changes += 1
+
+    def clear_lines(self, rows=None) -> list:
+        """Remove full rows and return the number of rows cleared at each height.
+
+        Only the given rows are checked, all of them by default.
+        """
+        if rows is None:
+            full = [y for y, row in enumerate(self.rows) if row == self.full]
+        else:
+            full = sorted(y for y in set(rows) if self.rows[y] == self.full)
+        full = full_rows_to_clear(full)
+        if not full:
+            return []
+        for y in reversed(full):
+            del self.rows[y]
+        self.rows[:0] = [0] * len(full)
+        lower_tops(self, full)
+        self.changes += 1
+        return line_combos(full)
+
+    def add_garbage(self, count, hole) -> None:
+        """Push the board up by count rows full except for column hole."""
+        self.rows = self.rows[count:] + [self.full & ~(1 << hole)] * count
+        self.update_tops()
+
+MASK64 = (1 << 64) - 1
+
+def splitmix64(seed, i) -> int:
+    """Value i of the splitmix64 stream of seed, the same stream batch.py draws from."""
+    z = (seed + (i + 1) * 0x9E3779B97F4A7C15) & MASK64
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & MASK64
+    return z ^ (z >> 31)
+
+class Generator:
+    """Base of the piece randomizers.
+
+    Draws come from a counter-based stream, so the state is just the seed
+    and the number of pieces drawn and seek() jumps anywhere at once.
+    """
+
+    def __init__(self, seed=None) -> None:
+        self.seed = seed if seed is not None else random.randrange(1 << 64)
+        self.drawn = 0
+
+    def copy(self):
+        """Generator drawing the same pieces from here on."""
+        return copy.copy(self)
+
+    def seek(self, drawn) -> None:
+        """Continue as if drawn pieces had been drawn."""
+        self.drawn = drawn
+
+class RandomGenerator(Generator):
+    """Independent uniform piece draws."""
+    name = 'random'
+
+    def next(self) -> int:
+        self.drawn += 1
+        return splitmix64(self.seed, self.drawn - 1) % 7 + 1
+
+class BagGenerator(Generator):
+    """Guideline 7-bag: every run of seven pieces holds each piece once."""
+    name = 'bag'
+
+    def __init__(self, seed=None) -> None:
+        super().__init__(seed)
+        self.bag = []
+
+    def copy(self):
+        other = super().copy()
+        other.bag = self.bag[:]
+        return other
+
+    def shuffled(self, n) -> list:
+        """Bag n, drawn from its end."""
+        bag = list(range(1, 8))
+        for i in range(6, 0, -1):
+            j = splitmix64(self.seed, 7 * n + i) % (i + 1)
+            bag[i], bag[j] = bag[j], bag[i]
+        return bag
+
+    def next(self) -> int:
+        if not self.bag:
+            self.bag = self.shuffled(self.drawn // 7)
+        self.drawn += 1
+        return self.bag.pop()
+
+    def seek(self, drawn) -> None:
+        super().seek(drawn)
+        self.bag = self.shuffled(drawn // 7)[:7 - drawn % 7] if drawn % 7 else []
+
+RANDOMIZERS = {
+    RandomGenerator.name: RandomGenerator,
+    BagGenerator.name: BagGenerator,
+}
+RANDOMIZER_IDS = {name: i for i, name in enumerate(sorted(RANDOMIZERS))}
+
+class RealClock:
+    """Wall-clock time, durations in seconds."""
+
+    def now(self) -> float:
+        return time.time()
+
+    def tick(self) -> None:
+        pass
+
+    def duration(self, seconds) -> float:
+        return seconds
+
+class TickClock:
+    """Counts Game.update calls, so timing does not depend on how fast frames run."""
+
+    def __init__(self, ticks_per_second=60) -> None:
+        self.ticks_per_second = ticks_per_second
+        self.ticks = 0
+
+    def now(self) -> int:
+        return self.ticks
+
+    def tick(self) -> None:
+        self.ticks += 1
+
+    def duration(self, seconds) -> float:
+        return seconds * self.ticks_per_second
+
+_snapshot_structs = {}
+# width and height at the start of every snapshot
+SNAPSHOT_SIZE = struct.Struct('<HH')
+
+def snapshot_struct(width, height):
+    """Fixed-size layout of Game.snapshot for a board size.
+
+    Fields are width, height, flags (1 can hold, 2 going), randomizer id,
+    current piece type, angle, x and y, next and held piece types (0 for
+    none), level, score, current level score, lines, pieces, frame, seed,
+    pieces drawn, clock units per second, clock units since the last drop
+    and since the piece was grounded (NaN when it is not), and the board as
+    packed by board.pack().
+    """
+    if (width, height) not in _snapshot_structs:
+        _snapshot_structs[(width, height)] = struct.Struct(
+            '<HHBBBBhhBBBIIIIIQIfdd{}s'.format((width * height + 1) // 2))
+    return _snapshot_structs[(width, height)]
+
+class Game:
+    width: int = 10
+    height: int = 20
+
+    level: int = 1
+    score: int = 0
+    current_level_score: int = 0
+    lines: int = 0
+    pieces: int = 0
+    going = True
+    ghost_position = (0, 0)
+    held_piece = None
+    can_hold = True
+    time_constant = 1.0
+    lock_delay = 0.5
+    lock_start = None
+    last_drop_time = 0
+    frame = 0
+    listener = None
+
+    def __init__(self, board=None, seed=None, randomizer='random', record=True, clock=None,
+                 listener=None) -> None:
+        self.board = board if board is not None else CellBoard(self.width, self.height)
+        self.clock = clock if clock is not None else RealClock()
+        self.width = self.board.width
+        self.height = self.board.height
+        # pick a seed even when none is given so every game can be replayed
+        if seed is not None and not 0 <= seed < SEED_LIMIT:
+            raise ValueError("seed must be from 0 to 2**64 - 1")
+        self.seed = seed if seed is not None else random.randrange(1 << 32)
+        self.randomizer = RANDOMIZERS[randomizer](self.seed)
+        # (frame, action) of every action applied, see replay.py
+        self.log = [] if record else None
+        self.current_piece = Tetromino(self.randomizer.next(), (self.width // 2 - 1, 0))
+        self.next_piece = Tetromino(self.randomizer.next(), (self.width // 2 - 1, 0))
+        self.ghost_position = self.calc_ghost()
+        self.last_drop_time = self.clock.now()
+        # a piece that does not fit where it spawns, on a board too narrow or
+        # already full there, could never lock
+        if self.current_piece.check_intersection(self.current_piece.position, self.board):
+            self.going = False
+        # called with every event of the game, see events.py
+        self.listener = listener
+        if listener is not None:
+            self.emit(Event.Start, self.seed, self.width, self.height)
+            if self.going:
+                self.emit_spawn()
+            else:
+                self.emit_game_over()
+
+    def emit(self, kind, *values) -> None:
+        if self.listener is not None:
+            self.listener((self.frame, kind) + values)
+
+    def emit_spawn(self) -> None:
+        piece = self.current_piece
+        self.emit(Event.Spawn, piece.block_type, piece.position[0], piece.position[1])
+
+    def snapshot(self) -> bytes:
+        buffer = bytearray(snapshot_struct(self.width, self.height).size)
+        self.snapshot_into(buffer)
+        return bytes(buffer)
+
+    def snapshot_into(self, buffer, offset=0) -> None:
+        """Write the state of the game into a writable buffer at offset."""
+        piece = self.current_piece
+        now = self.clock.now()
+        snapshot_struct(self.width, self.height).pack_into(
+            buffer, offset, self.width, self.height, self.can_hold | (self.going << 1),
+            RANDOMIZER_IDS[self.randomizer.name], piece.block_type, piece.angle,
+            piece.position[0], piece.position[1], self.next_piece.block_type,
+            self.held_piece.block_type if self.held_piece is not None else 0,
+            self.level, self.score, self.current_level_score, self.lines, self.pieces, self.frame,
+            self.seed, self.randomizer.drawn, self.clock.duration(1), now - self.last_drop_time,
+            now - self.lock_start if self.lock_start is not None else math.nan,
+            self.board.pack().to_bytes((self.width * self.height + 1) // 2, 'little'))
+
+    @classmethod
+    def from_snapshot(cls, data, offset=0, board=None, clock=None):
+        """Game in the state a snapshot was taken in, read in place from data at offset.
+
+        board must be empty and of the snapshot's size, a CellBoard by
+        default. The game is not recorded.
+        """
+        (width, height, flags, randomizer, block_type, angle, x, y, next_type, held_type, level,
+         score, current_level_score, lines, pieces, frame, seed, drawn, rate, since_drop, since_lock,
+         cells) = snapshot_struct(*SNAPSHOT_SIZE.unpack_from(data, offset)).unpack_from(data, offset)
+        if board is None:
+            board = CellBoard(width, height)
+        names = {i: name for name, i in RANDOMIZER_IDS.items()}
+        game = cls(board, seed, names[randomizer], record=False, clock=clock)
+        game.randomizer.seek(drawn)
+        board.unpack(int.from_bytes(cells, 'little'))
+        spawn = game.width // 2 - 1
+        game.current_piece = Tetromino(block_type, (x, y), angle)
+        # only the first next piece spawns a row lower
+        game.next_piece = Tetromino(next_type, (spawn, 0 if drawn == 2 else -1))
+        game.held_piece = Tetromino(held_type, (spawn, -1)) if held_type else None
+        game.can_hold = bool(flags & 1)
+        game.going = bool(flags & 2)
+        game.level = level
+        game.time_constant = (0.8 - ((level - 1) * 0.007)) ** (level - 1)
+        game.score = score
+        game.current_level_score = current_level_score
+        game.lines = lines
+        game.pieces = pieces
+        game.frame = frame
+        now = game.clock.now()
+        # timers are only converted when the clock counts at another rate
+        scale = 1 if game.clock.duration(1) == rate else game.clock.duration(1) / rate
+        game.last_drop_time = now - since_drop * scale
+        if not math.isnan(since_lock):
+            game.lock_start = now - since_lock * scale
+        game.ghost_position = game.calc_ghost()
+        return game
+
+    def clone(self):
+        """Independent copy of the game that is not recorded, for searching ahead."""
+        game = copy.copy(self)
+        game.board = self.board.copy()
+        game.current_piece = Tetromino(self.current_piece.block_type, self.current_piece.position,
+                                       self.current_piece.angle)
+        game.next_piece = Tetromino(self.next_piece.block_type, self.next_piece.position)
+        if self.held_piece is not None:
+            game.held_piece = Tetromino(self.held_piece.block_type, self.held_piece.position)
+        game.randomizer = self.randomizer.copy()
+        game.clock = copy.copy(self.clock)
+        game.log = None
+        game.listener = None
+        return game
+
+    def drop_piece(self) -> None:
+        self.current_piece.drop()
+        self.last_drop_time = self.clock.now()
+
+    def check_grounded(self) -> None:
+        if self.current_piece.check_grounded(self.board):
+            self.lock_start = self.clock.now()
+            self.last_drop_time = self.lock_start
+        else:
+            self.lock_start = None
+
+    def transfer_piece(self):
+        self.board.place(self.current_piece.block_type,
+                         self.current_piece.angle,
+                         self.current_piece.position)
+
+    def calc_ghost(self):
+        piece = self.current_piece
+        y = landing_row(self.board.tops, PIECES[piece.block_type][piece.angle], piece.position)
+        if y is not None:
+            return (piece.position[0], y)
+        for y in range(self.current_piece.position[1], self.height):
+            if self.current_piece.check_intersection((self.current_piece.position[0],
+                                                      y + 1),
+                                                     self.board):
+                return (self.current_piece.position[0], y)
+        return self.current_piece.position
+
+    def clear_lines(self) -> None:
+        piece = self.current_piece
+        # only the rows of the piece just locked can have become full, and
+        # the top row, which stays full until rows below it clear
+        rows = [piece.position[1] + dy for dy, mask in PIECES[piece.block_type][piece.angle].rows]
+        rows = [y for y in rows if 0 <= y < self.height] + [0]
+        for combo in self.board.clear_lines(rows):
+            self.lines += combo
+            self.score += LINE_SCORES[combo]
+            self.current_level_score += LINE_SCORES[combo]
+            self.emit(Event.LinesCleared, combo, self.score)
+
+        if self.current_level_score > (10 * self.level) and self.level < 20:
+            self.level += 1
+            self.current_level_score = 0
+            self.time_constant = (0.8 - ((self.level - 1) * 0.007)) ** (self.level - 1)
+            self.emit(Event.LevelUp, self.level)
+
+    def add_garbage(self, count, hole) -> None:
+        """Raise count garbage rows with a hole at column hole, lifting the piece out of them."""
+        # blocks pushed off the top end the game
+        self.emit(Event.Garbage, count, hole)
+        if min(self.board.tops) < count and self.going:
+            self.going = False
+            self.emit_game_over()
+        self.board.add_garbage(count, hole)
+        piece = self.current_piece
+        for i in range(count):
+            if not piece.check_intersection(piece.position, self.board):
+                break
+            piece.position = (piece.position[0], piece.position[1] - 1)
+        self.ghost_position = self.calc_ghost()
+        self.check_grounded()
+
+    def add_next_piece(self):
+        self.current_piece = self.next_piece
+        self.next_piece = Tetromino(self.randomizer.next(), (self.width // 2 - 1, -1))
+
+    def hold_piece(self):
+        if self.held_piece:
+            tmp = Tetromino(self.current_piece.block_type, (self.width // 2 - 1, -1))
+            self.current_piece = self.held_piece
+            self.held_piece = tmp
+        else:
+            self.held_piece = Tetromino(self.current_piece.block_type, (self.width // 2 - 1, -1))
+            self.add_next_piece()
+        self.can_hold = False
+        self.lock_start = None
+        self.ghost_position = self.calc_ghost()
+        if self.listener is not None:
+            self.emit(Event.Hold, self.held_piece.block_type)
+            self.emit_spawn()
+
+    def try_move(self, dx, dy) -> bool:
+        piece = self.current_piece
+        if piece.check_intersection((piece.position[0] + dx, piece.position[1] + dy), self.board):
+            return False
+        if dx < 0:
+            piece.move_left()
+        elif dx > 0:
+            piece.move_right()
+        else:
+            self.drop_piece()
+        self.ghost_position = self.calc_ghost()
+        self.check_grounded()
+        return True
+
+    def emit_rotate(self, action, kicks, position) -> None:
+        # the kick used is the offset the piece turned with
+        piece = self.current_piece
+        kick = kicks.index((piece.position[0] - position[0], piece.position[1] - position[1]))
+        self.emit(Event.Rotate, action, piece.angle, kick, piece.position[0], piece.position[1])
+
+    def emit_game_over(self) -> None:
+        self.emit(Event.GameOver, self.score, self.lines, self.level, self.pieces)
+
+    def lock_piece(self) -> None:
+        if self.listener is not None:
+            piece = self.current_piece
+            self.emit(Event.Lock, piece.block_type, piece.angle, piece.position[0], piece.position[1])
+        self.transfer_piece()
+        self.pieces += 1
+        self.clear_lines()
+        self.add_next_piece()
+        self.can_hold = True
+        self.ghost_position = self.calc_ghost()
+        if not self.current_piece.check_intersection((self.current_piece.position[0],
+                                                      self.current_piece.position[1] + 1),
+                                                     self.board):
+            self.drop_piece()
+            self.check_grounded()
+            self.emit_spawn()
+        else:
+            self.going = False
+            self.emit_game_over()
+
+    def apply(self, action) -> None:
+        if self.log is not None:
+            self.log.append((self.frame, action))
+        piece = self.current_piece
+        if action == Action.RotateClockwise:
+            angle, position = piece.angle, piece.position
+            if piece.try_turn_clockwise(self.board):
+                self.ghost_position = self.calc_ghost()
+                self.check_grounded()
+                if self.listener is not None:
+                    self.emit_rotate(action, PIECES[piece.block_type][angle].kicks_clockwise, position)
+        elif action == Action.RotateCounterclockwise:
+            angle, position = piece.angle, piece.position
+            if piece.try_turn_counterclockwise(self.board):
+                self.ghost_position = self.calc_ghost()
+                self.check_grounded()
+                if self.listener is not None:
+                    self.emit_rotate(action, PIECES[piece.block_type][angle].kicks_counterclockwise, position)
+        elif action == Action.MoveLeft:
+            if self.try_move(-1, 0):
+                self.emit(Event.Move, action, piece.position[0], piece.position[1])
+        elif action == Action.MoveRight:
+            if self.try_move(1, 0):
+                self.emit(Event.Move, action, piece.position[0], piece.position[1])
+        elif action == Action.SoftDrop:
+            if self.try_move(0, 1):
+                self.emit(Event.Move, action, piece.position[0], piece.position[1])
+        elif action == Action.HardDrop:
+            # the ghost is where the piece lands
+            self.ghost_position = self.calc_ghost()
+            if self.ghost_position[1] > piece.position[1]:
+                piece.position = self.ghost_position
+                self.last_drop_time = self.clock.now()
+                self.check_grounded()
+                self.emit(Event.Move, action, piece.position[0], piece.position[1])
+        elif action == Action.Hold and self.can_hold:
+            self.hold_piece()
+        elif action == Action.Gravity:
+            # a grounded piece stays put until the lock delay runs out
+            if self.try_move(0, 1):
+                self.emit(Event.Move, action, piece.position[0], piece.position[1])
+        elif action == Action.Lock:
+            self.lock_piece()
+
+    def update(self, actions) -> bool:
+        if not self.going:
+            return False
+        self.frame += 1
+        self.clock.tick()
+        for action in actions:
+            self.apply(action)
+
+        now = self.clock.now()
+        if self.lock_start is not None and now - self.lock_start > self.clock.duration(self.lock_delay):
+            self.apply(Action.Lock)
+        elif self.lock_start is None and now - self.last_drop_time > self.clock.duration(self.time_constant):
+            self.apply(Action.Gravity)
+        return True
@@ -0,0 +1,161 @@
+# Sinks for the event stream of a Game, and reading it back.
+import json
+import queue
+import socket
+import sys
+import threading
+from engine import Event
+
+# names of the values after (frame, kind) of each kind of event
+FIELDS = {
+    Event.Start: ('seed', 'width', 'height'),
+    Event.Spawn: ('block_type', 'x', 'y'),
+    Event.Move: ('action', 'x', 'y'),
+    Event.Rotate: ('action', 'angle', 'kick', 'x', 'y'),
+    Event.Lock: ('block_type', 'angle', 'x', 'y'),
+    Event.LinesCleared: ('combo', 'score'),
+    Event.LevelUp: ('level',),
+    Event.Hold: ('block_type',),
+    Event.Garbage: ('count', 'hole'),
+    Event.GameOver: ('score', 'lines', 'level', 'pieces'),
+}
+NAMES = {kind: name for name, kind in vars(Event).items() if not name.startswith('_')}
+KINDS = {name: kind for kind, name in NAMES.items()}
+
+def encode(events) -> bytes:
+    """Events as JSON lines, one object per event with its values by name."""
+    lines = []
+    for event in events:
+        record = {'frame': event[0], 'event': NAMES[event[1]]}
+        record.update(zip(FIELDS[event[1]], event[2:]))
+        lines.append(json.dumps(record, separators=(',', ':')))
+    lines.append('')
+    return '\n'.join(lines).encode()
+
+class BatchedSink:
+    """Game listener that collects events and hands them to a writer thread in batches.
+
+    Calling the sink only appends to a list, so a game emitting events never
+    waits on encoding or I/O. A batch goes out once it holds batch_size events,
+    and the writer thread takes what has collected whenever it has been idle
+    for max_delay seconds, so events still arrive when a game goes quiet.
+    Subclasses implement write().
+    """
+
+    def __init__(self, batch_size=1024, max_delay=1.0) -> None:
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self.batch = []
+        self.lock = threading.Lock()
+        self.queue = queue.SimpleQueue()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def __call__(self, event) -> None:
+        # batches are queued under the lock so they reach the writer in order
+        with self.lock:
+            self.batch.append(event)
+            if len(self.batch) >= self.batch_size:
+                self.queue.put(self.batch)
+                self.batch = []
+
+    def flush(self) -> None:
+        with self.lock:
+            if self.batch:
+                self.queue.put(self.batch)
+                self.batch = []
+
+    def run(self) -> None:
+        while True:
+            try:
+                batch = self.queue.get(timeout=self.max_delay)
+            except queue.Empty:
+                self.flush()
+                continue
+            if batch is None:
+                break
+            self.write(encode(batch))
+
+    def write(self, data) -> None:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        """Write the events still buffered and wait for the writer thread."""
+        self.flush()
+        self.queue.put(None)
+        self.thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+class FileSink(BatchedSink):
+    def __init__(self, file, **kwargs) -> None:
+        self.file = open(file, 'ab')
+        super().__init__(**kwargs)
+
+    def write(self, data) -> None:
+        self.file.write(data)
+        self.file.flush()
+
+    def close(self) -> None:
+        super().close()
+        self.file.close()
+
+class SocketSink(BatchedSink):
+    """Streams events to a local collector, at a Unix socket path or a (host, port) address.
+
+    Events are dropped, and counted, while the collector cannot be reached.
+    """
+
+    def __init__(self, address, **kwargs) -> None:
+        self.address = address
+        self.socket = None
+        self.dropped = 0
+        super().__init__(**kwargs)
+
+    def connect(self):
+        if isinstance(self.address, tuple):
+            return socket.create_connection(self.address)
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(self.address)
+        return sock
+
+    def write(self, data) -> None:
+        try:
+            if self.socket is None:
+                self.socket = self.connect()
+            self.socket.sendall(data)
+        except OSError:
+            self.dropped += data.count(b'\n')
+            if self.socket is not None:
+                self.socket.close()
+                self.socket = None
+
+    def close(self) -> None:
+        super().close()
+        if self.socket is not None:
+            self.socket.close()
+        if self.dropped:
+            print("dropped {} events, could not send them to {}".format(self.dropped, self.address),
+                  file=sys.stderr)
+
+def open_sink(target, **kwargs):
+    """SocketSink for unix:PATH or tcp:HOST:PORT targets, FileSink for anything else."""
+    if target.startswith('unix:'):
+        return SocketSink(target[len('unix:'):], **kwargs)
+    if target.startswith('tcp:'):
+        host, port = target[len('tcp:'):].rsplit(':', 1)
+        return SocketSink((host, int(port)), **kwargs)
+    return FileSink(target, **kwargs)
+
+def read_events(lines):
+    """Events of JSON lines as (frame, kind, *values) tuples, one line at a time."""
+    for line in lines:
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        kind = KINDS[record['event']]
+        yield (record['frame'], kind) + tuple(record[name] for name in FIELDS[kind])
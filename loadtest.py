@@ -0,0 +1,100 @@
+#!/bin/env python3
+# Load test for server.py: loopback clients sending random inputs in more and more matches.
+import argparse
+import asyncio
+import collections
+import random
+import subprocess
+import sys
+import time
+from server import DELTA, DELTA_MESSAGE, MATCH_OVER, PLAYER_ACTIONS, WELCOME_MESSAGE, frame, read_frame
+
+ACTIONS = sorted(PLAYER_ACTIONS)
+
+async def client(host, port, input_rate, rng, latencies, stop) -> None:
+    """Send random inputs until stop is set, recording the seconds until each one is applied."""
+    while not stop.is_set():
+        reader, writer = await asyncio.open_connection(host, port)
+        payload = await read_frame(reader)
+        if payload is None:
+            break
+        player = WELCOME_MESSAGE.unpack(payload)[1]
+        # send times of the inputs the server has not applied yet
+        pending = collections.deque()
+        applied = 0
+
+        async def send_inputs():
+            while True:
+                await asyncio.sleep(rng.expovariate(input_rate))
+                pending.append(time.perf_counter())
+                writer.write(frame(bytes((rng.choice(ACTIONS),))))
+
+        sender = asyncio.create_task(send_inputs())
+        try:
+            while not stop.is_set():
+                payload = await read_frame(reader)
+                if payload is None or payload[0] == MATCH_OVER:
+                    break
+                if payload[0] == DELTA and payload[1] == player:
+                    now = time.perf_counter()
+                    total = DELTA_MESSAGE.unpack_from(payload)[3]
+                    while applied < total and pending:
+                        latencies.append(now - pending.popleft())
+                        applied += 1
+        finally:
+            sender.cancel()
+            writer.close()
+
+async def stage(host, port, matches, duration, input_rate, seed):
+    """Sorted input latencies of the given number of matches played for duration seconds."""
+    latencies = []
+    stop = asyncio.Event()
+    rng = random.Random(seed)
+    tasks = [asyncio.create_task(client(host, port, input_rate, random.Random(rng.random()), latencies, stop))
+             for i in range(2 * matches)]
+    await asyncio.sleep(duration)
+    stop.set()
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    return sorted(latencies)
+
+def percentile(samples, p):
+    return samples[min(len(samples) - 1, len(samples) * p // 100)]
+
+async def run(args) -> None:
+    print('{:>8}{:>10}{:>10}{:>10}{:>10}{:>10}'.format('matches', 'inputs', 'p50 ms', 'p90 ms', 'p99 ms', 'max ms'))
+    for matches in args.matches:
+        latencies = await stage(args.host, args.port, matches, args.duration, args.input_rate, args.seed)
+        if not latencies:
+            print('{:>8}{:>10}'.format(matches, 0))
+            continue
+        print('{:>8}{:>10}{:>10.1f}{:>10.1f}{:>10.1f}{:>10.1f}'.format(
+            matches, len(latencies), *(percentile(latencies, p) * 1000 for p in (50, 90, 99, 100))))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure input latency of server.py as matches are added.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=7777)
+    parser.add_argument('--matches', type=lambda s: [int(n) for n in s.split(',')], default=[1, 10, 100, 1000],
+                        help="comma separated match counts to test")
+    parser.add_argument('--duration', type=float, default=10, help="seconds per match count")
+    parser.add_argument('--input-rate', type=float, default=5, help="inputs per second per player")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--spawn-server', action='store_true', help="start server.py for the test")
+    args = parser.parse_args(argv)
+
+    server = None
+    if args.spawn_server:
+        server = subprocess.Popen([sys.executable, 'server.py', '--host', args.host, '--port', str(args.port),
+                                   '--report', '0'], stdout=subprocess.DEVNULL)
+        time.sleep(1)
+    try:
+        asyncio.run(run(args))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,127 @@
+# Frame-time instrumentation for the main loop of tetris.py.
+import array
+import json
+import time
+
+PHASES = ('events', 'update', 'repaint', 'hud', 'overlay', 'display', 'sleep')
+
+class FrameProfiler:
+    """Durations of each phase of the last frames, kept in a ring buffer.
+
+    Call start_frame() at the top of the loop and mark(phase) as each phase
+    ends. end_frame() counts the frame as dropped when the work in it, all
+    but the sleep phase, took longer than a frame.
+    """
+
+    def __init__(self, phases=PHASES, size=3600, fps=60) -> None:
+        self.phases = phases
+        self.index = {phase: i for i, phase in enumerate(phases)}
+        self.size = size
+        self.budget = 1 / fps
+        # seconds spent in phase p of frame f at durations[f % size * len(phases) + p]
+        self.durations = array.array('d', bytes(8 * size * len(phases)))
+        self.starts = array.array('d', bytes(8 * size))
+        self.frames = 0
+        self.dropped = 0
+        self.frame_start = 0.0
+        self.last = 0.0
+        self.zeros = array.array('d', bytes(8 * len(phases)))
+
+    def start_frame(self) -> None:
+        self.frame_start = self.last = time.perf_counter()
+        row = (self.frames % self.size) * len(self.phases)
+        self.durations[row:row + len(self.phases)] = self.zeros
+        self.starts[self.frames % self.size] = self.frame_start
+
+    def mark(self, phase) -> None:
+        now = time.perf_counter()
+        self.durations[(self.frames % self.size) * len(self.phases) + self.index[phase]] += now - self.last
+        self.last = now
+
+    def end_frame(self) -> None:
+        sleep = self.durations[(self.frames % self.size) * len(self.phases) + self.index['sleep']]
+        if self.last - self.frame_start - sleep > self.budget:
+            self.dropped += 1
+        self.frames += 1
+
+    def recorded(self):
+        """Ring buffer slots of the recorded frames, oldest first."""
+        count = min(self.frames, self.size)
+        return [(self.frames - count + i) % self.size for i in range(count)]
+
+    def frame_times(self, phase=None) -> list:
+        """Seconds per recorded frame, in total or for one phase."""
+        n = len(self.phases)
+        if phase is not None:
+            p = self.index[phase]
+            return [self.durations[slot * n + p] for slot in self.recorded()]
+        return [sum(self.durations[slot * n:slot * n + n]) for slot in self.recorded()]
+
+    def percentiles(self, phase=None, points=(50, 99)) -> list:
+        times = sorted(self.frame_times(phase))
+        if not times:
+            return [0.0 for p in points]
+        return [times[min(len(times) - 1, len(times) * p // 100)] for p in points]
+
+    def write_csv(self, file) -> None:
+        n = len(self.phases)
+        with open(file, 'w') as f:
+            f.write('frame,start,' + ','.join(self.phases) + ',total\n')
+            first = self.frames - len(self.recorded())
+            for i, slot in enumerate(self.recorded()):
+                row = self.durations[slot * n:slot * n + n]
+                f.write('{},{:.6f},{},{:.6f}\n'.format(first + i, self.starts[slot],
+                                                      ','.join('{:.6f}'.format(t) for t in row), sum(row)))
+
+    def write_chrome_trace(self, file) -> None:
+        """Trace viewable in chrome://tracing or Perfetto, one slice per frame and phase."""
+        n = len(self.phases)
+        slots = self.recorded()
+        origin = self.starts[slots[0]] if slots else 0.0
+        events = []
+        for slot in slots:
+            ts = (self.starts[slot] - origin) * 1e6
+            row = self.durations[slot * n:slot * n + n]
+            events.append({'name': 'frame', 'ph': 'X', 'ts': ts, 'dur': sum(row) * 1e6, 'pid': 1, 'tid': 1})
+            for phase, duration in zip(self.phases, row):
+                events.append({'name': phase, 'ph': 'X', 'ts': ts, 'dur': duration * 1e6, 'pid': 1, 'tid': 1})
+                ts += duration * 1e6
+        with open(file, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+
+    def write(self, file) -> None:
+        """Export as a Chrome trace for .json files and as CSV otherwise."""
+        if file.endswith('.json'):
+            self.write_chrome_trace(file)
+        else:
+            self.write_csv(file)
+
+class NullProfiler:
+    """Stands in for FrameProfiler when profiling is off."""
+
+    def start_frame(self) -> None:
+        pass
+
+    def mark(self, phase) -> None:
+        pass
+
+    def end_frame(self) -> None:
+        pass
+
+class StartupTimer:
+    """Time taken by each step of starting up, from start, a perf_counter value."""
+
+    def __init__(self, start) -> None:
+        self.last = start
+        self.start = start
+        self.steps = []
+
+    def mark(self, step) -> None:
+        now = time.perf_counter()
+        self.steps.append((step, now - self.last))
+        self.last = now
+
+    def report(self) -> str:
+        lines = ['{:<12}{:>8.1f} ms'.format(step, seconds * 1000) for step, seconds in self.steps]
+        lines.append('{:<12}{:>8.1f} ms'.format('total', (self.last - self.start) * 1000))
+        return '\n'.join(lines)
@@ -0,0 +1,101 @@
+#!/bin/env python3
+# Compact input logs of games and headless replay.
+import argparse
+import struct
+import sys
+from engine import BitBoard, CellBoard, Game, RANDOMIZER_IDS
+
+# magic, version, seed, randomizer, width, height
+HEADER = struct.Struct('<4sBQBHH')
+MAGIC = b'TRPL'
+VERSION = 2
+
+class Replay:
+    """Seed, randomizer and the (frame, action) log of a game.
+
+    Gravity and locking are logged as actions too, so replaying does not
+    depend on the clock the game was played with.
+    """
+
+    def __init__(self, seed, randomizer, width, height, events) -> None:
+        self.seed = seed
+        self.randomizer = randomizer
+        self.width = width
+        self.height = height
+        self.events = events
+
+    @classmethod
+    def from_game(cls, game):
+        if game.log is None:
+            raise ValueError("game was not recorded")
+        return cls(game.seed, game.randomizer.name, game.width, game.height, list(game.log))
+
+    def to_bytes(self) -> bytes:
+        data = bytearray(HEADER.pack(MAGIC, VERSION, self.seed, RANDOMIZER_IDS[self.randomizer],
+                                     self.width, self.height))
+        frame = 0
+        for event_frame, action in self.events:
+            # varint of the frame delta with the action in the low four bits
+            value = ((event_frame - frame) << 4) | action
+            frame = event_frame
+            while value > 0x7F:
+                data.append((value & 0x7F) | 0x80)
+                value >>= 7
+            data.append(value)
+        return bytes(data)
+
+    @classmethod
+    def from_bytes(cls, data):
+        magic, version, seed, randomizer, width, height = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("not a version {} replay".format(VERSION))
+        names = {i: name for name, i in RANDOMIZER_IDS.items()}
+        events = []
+        frame = 0
+        value = 0
+        shift = 0
+        for byte in memoryview(data)[HEADER.size:]:
+            value |= (byte & 0x7F) << shift
+            shift += 7
+            if not byte & 0x80:
+                frame += value >> 4
+                events.append((frame, value & 0xF))
+                value = 0
+                shift = 0
+        return cls(seed, names[randomizer], width, height, events)
+
+    def save(self, file) -> None:
+        with open(file, 'wb') as f:
+            f.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, file):
+        with open(file, 'rb') as f:
+            return cls.from_bytes(f.read())
+
+    def run(self, board=None):
+        """Replay the log headlessly as fast as possible and return the final game."""
+        if board is None:
+            board = CellBoard(self.width, self.height)
+        game = Game(board, self.seed, self.randomizer, record=False)
+        for frame, action in self.events:
+            game.frame = frame
+            game.apply(action)
+        return game
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay a recorded game headlessly.")
+    parser.add_argument('file')
+    parser.add_argument('--bitboard', action='store_true', help="replay on the compact board")
+    args = parser.parse_args(argv)
+
+    replay = Replay.load(args.file)
+    board = BitBoard(replay.width, replay.height) if args.bitboard else None
+    game = replay.run(board)
+    for row in game.board.row_bits():
+        print(''.join('#' if (row >> x) & 1 else '.' for x in range(game.width)))
+    print("score {} level {} lines {} pieces {} frames {}".format(
+        game.score, game.level, game.lines, game.pieces, game.frame))
+
+if __name__ == '__main__':
+    sys.exit(main())
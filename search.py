@@ -0,0 +1,243 @@
+# Placement enumeration and move search for bots.
+from collections import deque, namedtuple
+from engine import Action, PIECES, row_masks
+
+# rows is a tuple of (y, mask) pairs the piece occupies once locked
+Placement = namedtuple('Placement', ['angle', 'position', 'rows', 'path'])
+
+# weights of board features in evaluate()
+HEIGHT_WEIGHT = -0.510066
+LINES_WEIGHT = 0.760666
+HOLES_WEIGHT = -0.35663
+BUMPINESS_WEIGHT = -0.184483
+TOP_OUT_SCORE = -1e9
+
+# rows above the board and columns past the walls a piece can reach
+OFFSET = 4
+
+def placements(rows, block_type, position, angle=0, width=10, tucks=True):
+    """Every resting place reachable from the given state, each with a short path of actions.
+
+    rows holds the board as ints with bit x set for an occupied column x.
+    Pieces move with the same rules as Tetromino, including SRS kicks and
+    soft drops, so spins, tucks under overhangs and turns partway down are
+    found. Soft drops go one row at a time only once the piece is level with
+    the stack around it: higher up a move or turn does the same at any height,
+    so the piece drops straight to that level. With tucks off pieces are only
+    moved and turned before they are hard dropped, which is faster still.
+    """
+    height = len(rows)
+    table = row_masks(width)[block_type]
+    rotations = PIECES[block_type]
+
+    # bit y + OFFSET of columns[c] is set when column c of row y is occupied
+    columns = [0] * width
+    for y, row in enumerate(rows):
+        while row:
+            low = row & -row
+            columns[low.bit_length() - 1] |= 1 << (y + OFFSET)
+            row ^= low
+
+    # bit y + OFFSET of collisions[a][x + OFFSET] is set when the piece
+    # collides at (x, y) turned to angle a; bit 0 is only set past the walls,
+    # so shifts are clamped at 0 for rows higher up
+    floor = -1 << (height + OFFSET)
+    collisions = []
+    for a in range(4):
+        bits_by_x = [-1] * (width + 2 * OFFSET)
+        for x, masks in table[a].items():
+            bits = 0
+            for dy, mask in masks:
+                occupied = floor
+                while mask:
+                    low = mask & -mask
+                    occupied |= columns[low.bit_length() - 1]
+                    mask ^= low
+                bits |= occupied >> dy
+            bits_by_x[x + OFFSET] = bits
+        collisions.append(bits_by_x)
+
+    # a piece at (x, y) is clear of the stack, with its box and the columns
+    # either side empty down to the box's bottom row, while y <= clear[x + OFFSET]
+    dim = rotations[0].dim[0]
+    tops = [((c >> OFFSET) & -(c >> OFFSET)).bit_length() - 1 if c else height for c in columns]
+    clear = [min(tops[max(x - 1, 0):x + dim + 1], default=height) - dim
+             for x in range(-OFFSET, width + OFFSET)]
+
+    start = (angle, position[0], position[1])
+    if (collisions[angle][position[0] + OFFSET] >> max(position[1] + OFFSET, 0)) & 1:
+        return []
+    parents = {start: None}
+    queue = deque([start])
+    found = {}
+    turns = [((rotations[a].kicks_clockwise, (a + 1) & 3, Action.RotateClockwise),
+              (rotations[a].kicks_counterclockwise, (a - 1) & 3, Action.RotateCounterclockwise))
+             for a in range(4)]
+    while queue:
+        state = queue.popleft()
+        a, x, y = state
+        bits = collisions[a]
+        successors = []
+        shift = max(y + OFFSET, 0)
+        # rows from the one under the piece down, rows above -OFFSET are free
+        first = max(y + 1, -OFFSET)
+        below = bits[x + OFFSET] >> (first + OFFSET)
+        if below & 1:
+            cells = tuple((y + dy, mask) for dy, mask in table[a][x])
+            if cells not in found:
+                found[cells] = state
+            if not tucks and state != start:
+                continue
+        else:
+            landing = first + (below & -below).bit_length() - 2
+            successors.append(((a, x, landing), Action.HardDrop))
+            if tucks:
+                level = max(clear[x + OFFSET] + 1, y + 1)
+                if level < landing:
+                    successors.append(((a, x, level), Action.SoftDrop))
+        if not (bits[x + OFFSET - 1] >> shift) & 1:
+            successors.append(((a, x - 1, y), Action.MoveLeft))
+        if not (bits[x + OFFSET + 1] >> shift) & 1:
+            successors.append(((a, x + 1, y), Action.MoveRight))
+        for kicks, target, action in turns[a]:
+            target_bits = collisions[target]
+            for dx, dy in kicks:
+                if not (target_bits[x + dx + OFFSET] >> max(y + dy + OFFSET, 0)) & 1:
+                    successors.append(((target, x + dx, y + dy), action))
+                    break
+        for successor, action in successors:
+            if successor not in parents:
+                parents[successor] = (state, action)
+                queue.append(successor)
+
+    result = []
+    for cells, state in found.items():
+        path = []
+        step = state
+        while parents[step] is not None:
+            parent, action = parents[step]
+            # soft drops from high up cover several rows
+            if action == Action.SoftDrop:
+                path.extend([action] * (step[2] - parent[2]))
+            else:
+                path.append(action)
+            step = parent
+        path.reverse()
+        result.append(Placement(state[0], (state[1], state[2]), cells, path))
+    return result
+
+def place(rows, cells, full):
+    """Board rows after locking the given cells, and the number of lines cleared."""
+    rows = list(rows)
+    for y, mask in cells:
+        if y >= 0:
+            rows[y] |= mask
+    kept = [row for row in rows if row != full]
+    cleared = len(rows) - len(kept)
+    return tuple([0] * cleared + kept), cleared
+
+def evaluate(rows, cleared, width):
+    """Heuristic value of a board: lower and flatter with fewer holes is better."""
+    height = len(rows)
+    heights = [0] * width
+    seen = 0
+    holes = 0
+    for y, row in enumerate(rows):
+        if not seen:
+            if not row:
+                continue
+        else:
+            holes += bin(seen & ~row).count('1')
+        new = row & ~seen
+        while new:
+            low = new & -new
+            heights[low.bit_length() - 1] = height - y
+            new ^= low
+        seen |= row
+    bumpiness = sum(abs(heights[x] - heights[x + 1]) for x in range(width - 1))
+    return (HEIGHT_WEIGHT * sum(heights)
+            + LINES_WEIGHT * cleared
+            + HOLES_WEIGHT * holes
+            + BUMPINESS_WEIGHT * bumpiness)
+
+class Searcher:
+    """Picks moves by evaluating placements, looking ahead through the next and held pieces.
+
+    Placement lists and board values are memoized on the board and piece
+    state, so positions revisited by the lookahead are only searched once.
+    """
+
+    def __init__(self, width=10, lookahead=1, cache_size=100000) -> None:
+        self.width = width
+        self.full = (1 << width) - 1
+        self.lookahead = lookahead
+        self.cache_size = cache_size
+        self.placement_cache = {}
+        self.value_cache = {}
+
+    def placements(self, rows, block_type, position, angle=0, tucks=True):
+        key = (rows, block_type, position, angle, tucks)
+        result = self.placement_cache.get(key)
+        if result is None:
+            if len(self.placement_cache) >= self.cache_size:
+                self.placement_cache.clear()
+            result = placements(rows, block_type, position, angle, self.width, tucks)
+            self.placement_cache[key] = result
+        return result
+
+    def value(self, rows, pieces):
+        """Best value reachable by placing the pieces in order on rows."""
+        key = (rows, pieces)
+        result = self.value_cache.get(key)
+        if result is not None:
+            return result
+        result = TOP_OUT_SCORE
+        spawn = (self.width // 2 - 1, 0)
+        # lookahead pieces are not tucked, that is rarely worth its cost
+        for placement in self.placements(rows, pieces[0], spawn, tucks=False):
+            result = max(result, self.placement_value(rows, placement, pieces[1:]))
+        if len(self.value_cache) >= self.cache_size:
+            self.value_cache.clear()
+        self.value_cache[key] = result
+        return result
+
+    def placement_value(self, rows, placement, pieces):
+        if placement.rows[0][0] < 0:
+            return TOP_OUT_SCORE
+        after, cleared = place(rows, placement.rows, self.full)
+        score = evaluate(after, cleared, self.width)
+        if pieces:
+            score += self.value(after, pieces)
+        return score
+
+    def best_move(self, game):
+        """Actions to play for the current piece, starting with Hold if holding is better."""
+        rows = tuple(game.board.row_bits())
+        piece = game.current_piece
+        upcoming = (game.next_piece.block_type,)[:self.lookahead]
+        options = [([], piece.block_type, piece.position, piece.angle, upcoming)]
+        if game.can_hold:
+            spawn = (game.width // 2 - 1, -1)
+            if game.held_piece is not None:
+                options.append(([Action.Hold], game.held_piece.block_type, spawn, 0, upcoming))
+            else:
+                options.append(([Action.Hold], game.next_piece.block_type, spawn, 0, ()))
+
+        best = None
+        best_score = None
+        for prefix, block_type, position, angle, pieces in options:
+            for placement in self.placements(rows, block_type, position, angle):
+                score = self.placement_value(rows, placement, pieces)
+                if best_score is None or score > best_score:
+                    best = prefix + placement.path
+                    best_score = score
+        return best if best is not None else []
+
+_searcher = None
+
+def search_policy(game, rng):
+    """Policy for simulate.py that plays the best move found by Searcher."""
+    global _searcher
+    if _searcher is None or _searcher.width != game.width:
+        _searcher = Searcher(game.width)
+    return _searcher.best_move(game)
@@ -0,0 +1,236 @@
+#!/bin/env python3
+# Versus server: one asyncio process runs every match at a fixed tick rate.
+#
+# Messages in both directions are framed by a little endian uint16 length.
+# Clients send the action codes of their inputs, one byte each. The server
+# answers with WELCOME once a match starts, then a DELTA whenever a
+# player's state changes, and MATCH_OVER when one of the players tops out.
+import argparse
+import asyncio
+import collections
+import random
+import struct
+import sys
+import traceback
+from engine import Action, BitBoard, Game, TickClock
+
+FRAME = struct.Struct('<H')
+WELCOME, DELTA, MATCH_OVER = 0, 1, 2
+# type, player, match, seed, width, height
+WELCOME_MESSAGE = struct.Struct('<BBIQHH')
+# type, player, tick, inputs applied, going, piece, angle, x, y, ghost y,
+# next piece, held piece, score, lines, level, changed rows
+DELTA_MESSAGE = struct.Struct('<BBIIBBBbbbBBIIBB')
+# y, bits of a changed row
+ROW = struct.Struct('<BI')
+# type, winner
+MATCH_OVER_MESSAGE = struct.Struct('<BB')
+
+# garbage rows sent for the number of lines cleared in one tick
+GARBAGE_LINES = [0, 0, 1, 2, 4]
+PLAYER_ACTIONS = frozenset((Action.RotateClockwise, Action.RotateCounterclockwise, Action.MoveLeft,
+                            Action.MoveRight, Action.SoftDrop, Action.HardDrop, Action.Hold))
+# clients that stop reading are dropped once this much output is queued
+MAX_WRITE_BUFFER = 1 << 20
+# board sizes that fit the row bits and the signed byte piece y of a delta
+MAX_WIDTH = 32
+MAX_HEIGHT = 127
+
+def frame(payload) -> bytes:
+    return FRAME.pack(len(payload)) + payload
+
+async def read_frame(reader):
+    """Payload of the next frame, None at the end of the stream."""
+    try:
+        header = await reader.readexactly(FRAME.size)
+        return await reader.readexactly(FRAME.unpack(header)[0])
+    except (asyncio.IncompleteReadError, ConnectionError):
+        return None
+
+class Player:
+    """A connection and the inputs it sent since the last tick."""
+
+    def __init__(self, writer) -> None:
+        self.writer = writer
+        self.inputs = []
+        self.applied = 0
+        self.connected = True
+
+    def send(self, payload) -> None:
+        if not self.connected:
+            return
+        if self.writer.transport.get_write_buffer_size() > MAX_WRITE_BUFFER:
+            self.connected = False
+            self.writer.close()
+            return
+        self.writer.write(frame(payload))
+
+class Match:
+    """Two players on the same piece sequence sending each other garbage."""
+
+    def __init__(self, match_id, seed, players, width, height, tick_rate) -> None:
+        self.match_id = match_id
+        self.players = players
+        self.games = [Game(BitBoard(width, height), seed, 'bag', record=False, clock=TickClock(tick_rate))
+                      for player in players]
+        self.rng = random.Random(seed)
+        self.tick = 0
+        # last state each client was sent, to send only what changed
+        self.rows = [game.board.row_bits() for game in self.games]
+        self.pieces = [None for game in self.games]
+        for i, player in enumerate(players):
+            player.send(WELCOME_MESSAGE.pack(WELCOME, i, match_id, seed, width, height))
+        for i in range(len(players)):
+            self.broadcast(i)
+
+    def step(self) -> bool:
+        """Apply the inputs received since the last tick, returns False once the match is over."""
+        self.tick += 1
+        garbage = []
+        for player, game in zip(self.players, self.games):
+            lines = game.lines
+            actions = [a for a in player.inputs if a in PLAYER_ACTIONS]
+            player.applied += len(player.inputs)
+            player.inputs.clear()
+            game.update(actions)
+            garbage.append(GARBAGE_LINES[min(game.lines - lines, 4)])
+        for i, count in enumerate(garbage):
+            if count:
+                for j, game in enumerate(self.games):
+                    if j != i and game.going:
+                        game.add_garbage(count, self.rng.randrange(game.width))
+        for i in range(len(self.games)):
+            self.broadcast(i)
+
+        alive = [i for i, (player, game) in enumerate(zip(self.players, self.games))
+                 if player.connected and game.going]
+        if len(alive) > 1:
+            return True
+        self.end(alive[0] if alive else 255)
+        return False
+
+    def end(self, winner) -> None:
+        for player in self.players:
+            player.send(MATCH_OVER_MESSAGE.pack(MATCH_OVER, winner))
+
+    def broadcast(self, i) -> None:
+        """Send every player the rows and piece state of player i that changed."""
+        game = self.games[i]
+        player = self.players[i]
+        piece = game.current_piece
+        state = (player.applied, game.going, piece.block_type, piece.angle, piece.position,
+                 game.ghost_position[1], game.next_piece.block_type,
+                 game.held_piece.block_type if game.held_piece is not None else 0,
+                 game.score, game.lines, game.level)
+        rows = game.board.row_bits()
+        changed = [(y, row) for y, (row, sent) in enumerate(zip(rows, self.rows[i])) if row != sent]
+        if state == self.pieces[i] and not changed:
+            return
+        self.pieces[i] = state
+        self.rows[i] = rows
+        payload = DELTA_MESSAGE.pack(DELTA, i, self.tick, player.applied, game.going, piece.block_type,
+                                     piece.angle, piece.position[0], piece.position[1],
+                                     game.ghost_position[1], state[6], state[7],
+                                     game.score, game.lines, game.level, len(changed))
+        payload += b''.join(ROW.pack(y, row) for y, row in changed)
+        for other in self.players:
+            other.send(payload)
+
+class Server:
+    """Pairs connections into matches and steps all of them on one timer."""
+
+    def __init__(self, tick_rate=60, width=10, height=20, seed=None) -> None:
+        if not (4 <= width <= MAX_WIDTH and 4 <= height <= MAX_HEIGHT):
+            raise ValueError("boards are 4 to {} cells wide and 4 to {} high".format(MAX_WIDTH, MAX_HEIGHT))
+        self.tick_rate = tick_rate
+        self.width = width
+        self.height = height
+        self.rng = random.Random(seed)
+        self.waiting = None
+        self.matches = []
+        self.match_count = 0
+        # seconds each of the recent ticks took and how late they started
+        self.tick_times = collections.deque(maxlen=1000)
+        self.tick_delays = collections.deque(maxlen=1000)
+
+    async def handle(self, reader, writer) -> None:
+        player = Player(writer)
+        if self.waiting is not None and self.waiting.connected:
+            self.match_count += 1
+            self.matches.append(Match(self.match_count, self.rng.randrange(1 << 32), [self.waiting, player],
+                                      self.width, self.height, self.tick_rate))
+            self.waiting = None
+        else:
+            self.waiting = player
+        while True:
+            payload = await read_frame(reader)
+            if payload is None:
+                break
+            player.inputs.extend(payload)
+        player.connected = False
+        writer.close()
+
+    async def run(self) -> None:
+        interval = 1 / self.tick_rate
+        loop = asyncio.get_running_loop()
+        next_tick = loop.time()
+        while True:
+            next_tick += interval
+            await asyncio.sleep(max(0, next_tick - loop.time()))
+            start = loop.time()
+            self.tick_delays.append(start - next_tick)
+            self.matches = [match for match in self.matches if self.step(match)]
+            self.tick_times.append(loop.time() - start)
+            # a server falling behind skips ticks rather than running them back to back
+            if loop.time() > next_tick + interval:
+                next_tick = loop.time()
+
+    def step(self, match) -> bool:
+        """Step one match, ending it instead of the server if it fails."""
+        try:
+            return match.step()
+        except Exception:
+            traceback.print_exc()
+            match.end(255)
+            return False
+
+    def stats(self) -> str:
+        if not self.tick_times:
+            return "no ticks"
+        times = sorted(self.tick_times)
+        return "{} matches, tick p50 {:.2f} ms p99 {:.2f} ms, late by up to {:.2f} ms".format(
+            len(self.matches), times[len(times) // 2] * 1000, times[len(times) * 99 // 100] * 1000,
+            max(self.tick_delays) * 1000)
+
+    async def serve(self, host, port, report=0) -> None:
+        server = await asyncio.start_server(self.handle, host, port)
+        print("listening on {}:{}".format(host, port))
+        async with server:
+            # an error in either ends the server instead of leaving it accepting players
+            await asyncio.gather(self.run(), self.report(report))
+
+    async def report(self, interval) -> None:
+        while interval:
+            await asyncio.sleep(interval)
+            print(self.stats())
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Host versus matches.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=7777)
+    parser.add_argument('--tick-rate', type=int, default=60)
+    parser.add_argument('--width', type=int, default=10)
+    parser.add_argument('--height', type=int, default=20)
+    parser.add_argument('--report', type=float, default=5, help="seconds between stats lines, 0 for none")
+    args = parser.parse_args(argv)
+    try:
+        server = Server(args.tick_rate, args.width, args.height)
+    except ValueError as e:
+        parser.error(str(e))
+    try:
+        asyncio.run(server.serve(args.host, args.port, args.report))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    sys.exit(main())
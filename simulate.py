@@ -0,0 +1,173 @@
+#!/bin/env python3
+# Play many headless games over a process pool and collect the results.
+import argparse
+import importlib
+import json
+import multiprocessing
+import random
+import struct
+import sys
+import time
+from engine import Action, BitBoard, Game
+from search import search_policy
+
+# seed, score, level, lines, pieces, duration
+RESULT_RECORD = struct.Struct('<QIIIId')
+RESULT_FIELDS = ('seed', 'score', 'level', 'lines', 'pieces', 'duration')
+
+def random_policy(game, rng):
+    """Turn and shift the current piece at random."""
+    actions = [rng.choice((Action.RotateClockwise, Action.RotateCounterclockwise))] * rng.randrange(3)
+    shift = rng.randrange(-game.width // 2, game.width // 2 + 1)
+    actions += [Action.MoveRight if shift > 0 else Action.MoveLeft] * abs(shift)
+    return actions
+
+POLICIES = {
+    'random': random_policy,
+    'search': search_policy,
+}
+
+def load_policy(name):
+    """Look up a built-in policy or import one given as module:function."""
+    if name in POLICIES:
+        return POLICIES[name]
+    module, _, attr = name.partition(':')
+    if not attr:
+        raise ValueError("unknown policy {!r}".format(name))
+    return getattr(importlib.import_module(module), attr)
+
+def play_game(seed, policy_name, max_pieces):
+    """Play one game where the policy places every piece, returns the result fields."""
+    policy = load_policy(policy_name)
+    rng = random.Random(seed)
+    start = time.perf_counter()
+    game = Game(BitBoard(), seed, record=False)
+    while game.going and game.pieces < max_pieces:
+        for action in policy(game, rng):
+            game.apply(action)
+        game.apply(Action.HardDrop)
+        game.apply(Action.Lock)
+    return (seed, game.score, game.level, game.lines, game.pieces, time.perf_counter() - start)
+
+def play_game_args(args):
+    return play_game(*args)
+
+class JsonlWriter:
+    def __init__(self, file) -> None:
+        self.file = open(file, 'w')
+
+    def write(self, result) -> None:
+        self.file.write(json.dumps(dict(zip(RESULT_FIELDS, result))) + '\n')
+
+    def close(self) -> None:
+        self.file.close()
+
+class BinaryWriter:
+    def __init__(self, file) -> None:
+        self.file = open(file, 'wb')
+
+    def write(self, result) -> None:
+        self.file.write(RESULT_RECORD.pack(*result))
+
+    def close(self) -> None:
+        self.file.close()
+
+def read_results(file):
+    """Yield result dicts from a file written by JsonlWriter or BinaryWriter."""
+    if file.endswith('.jsonl'):
+        with open(file) as f:
+            for line in f:
+                yield json.loads(line)
+    else:
+        with open(file, 'rb') as f:
+            while True:
+                data = f.read(RESULT_RECORD.size)
+                if len(data) < RESULT_RECORD.size:
+                    return
+                yield dict(zip(RESULT_FIELDS, RESULT_RECORD.unpack(data)))
+
+class Summary:
+    """Running aggregate of game results, the same size however many games are added.
+
+    Mean, stdev, min and max are exact. Percentiles come from a uniform
+    sample of at most sample_size results, kept by reservoir sampling.
+    """
+
+    def __init__(self, sample_size=10000) -> None:
+        self.fields = RESULT_FIELDS[1:]
+        self.games = 0
+        # per field running mean, sum of squared deviations, min and max
+        self.means = [0.0] * len(self.fields)
+        self.squares = [0.0] * len(self.fields)
+        self.minimums = [None] * len(self.fields)
+        self.maximums = [None] * len(self.fields)
+        self.sample_size = sample_size
+        self.sample = []
+        self.rng = random.Random(0)
+
+    def add(self, result) -> None:
+        values = result[1:]
+        self.games += 1
+        for i, value in enumerate(values):
+            # Welford's update
+            delta = value - self.means[i]
+            self.means[i] += delta / self.games
+            self.squares[i] += delta * (value - self.means[i])
+            if self.minimums[i] is None or value < self.minimums[i]:
+                self.minimums[i] = value
+            if self.maximums[i] is None or value > self.maximums[i]:
+                self.maximums[i] = value
+        if len(self.sample) < self.sample_size:
+            self.sample.append(values)
+        else:
+            slot = self.rng.randrange(self.games)
+            if slot < self.sample_size:
+                self.sample[slot] = values
+
+    def report(self, elapsed) -> str:
+        games = self.games
+        lines = ['{} games in {:.1f}s ({:.1f} games/s)'.format(games, elapsed, games / elapsed if elapsed else 0)]
+        if games == 0:
+            return lines[0]
+        lines.append('{:<10}{:>12}{:>12}{:>10}{:>10}{:>10}{:>10}'.format(
+            '', 'mean', 'stdev', 'min', 'p50', 'p99', 'max'))
+        for i, field in enumerate(self.fields):
+            ordered = sorted(values[i] for values in self.sample)
+            lines.append('{:<10}{:>12.2f}{:>12.2f}{:>10.4g}{:>10.4g}{:>10.4g}{:>10.4g}'.format(
+                field,
+                self.means[i],
+                (self.squares[i] / games) ** 0.5,
+                self.minimums[i],
+                ordered[len(ordered) // 2],
+                ordered[min(len(ordered) - 1, len(ordered) * 99 // 100)],
+                self.maximums[i]))
+        return '\n'.join(lines)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run headless games in parallel.")
+    parser.add_argument('--games', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=0, help="seed of the first game, the others count up")
+    parser.add_argument('--policy', default='random', help="built-in policy name or module:function")
+    parser.add_argument('--max-pieces', type=int, default=10000)
+    parser.add_argument('--workers', type=int, default=multiprocessing.cpu_count())
+    parser.add_argument('--output', help="results file, .jsonl for JSON lines, anything else for binary records")
+    args = parser.parse_args(argv)
+
+    load_policy(args.policy)
+    writer = None
+    if args.output:
+        writer = JsonlWriter(args.output) if args.output.endswith('.jsonl') else BinaryWriter(args.output)
+    summary = Summary()
+    jobs = ((args.seed + i, args.policy, args.max_pieces) for i in range(args.games))
+    start = time.perf_counter()
+    with multiprocessing.Pool(args.workers) as pool:
+        for result in pool.imap_unordered(play_game_args, jobs, chunksize=max(1, min(64, args.games // (args.workers * 8)))):
+            summary.add(result)
+            if writer:
+                writer.write(result)
+    if writer:
+        writer.close()
+    print(summary.report(time.perf_counter() - start))
+
+if __name__ == '__main__':
+    sys.exit(main())
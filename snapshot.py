@@ -0,0 +1,108 @@
+#!/bin/env python3
+# Files of fixed-size game snapshots, memory-mapped for datasets of many positions.
+import argparse
+import mmap
+import os
+import random
+import struct
+import sys
+import time
+from engine import Action, BitBoard, Game, snapshot_struct
+
+# magic, version, width, height, count
+HEADER = struct.Struct('<4sBHHQ')
+MAGIC = b'TSNP'
+VERSION = 3
+
+class SnapshotFile:
+    """Snapshots of games on one board size, stored back to back after a header.
+
+    Records are read and written in place in the mapped file, so the file
+    can be far larger than memory.
+    """
+
+    def __init__(self, file, width=10, height=20, create=False) -> None:
+        self.width = width
+        self.height = height
+        if create:
+            with open(file, 'wb') as f:
+                f.write(HEADER.pack(MAGIC, VERSION, width, height, 0))
+        self.file = open(file, 'r+b')
+        self.mmap = mmap.mmap(self.file.fileno(), 0)
+        magic, version, self.width, self.height, self.count = HEADER.unpack_from(self.mmap)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("not a version {} snapshot file".format(VERSION))
+        self.record = snapshot_struct(self.width, self.height)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def offset(self, i) -> int:
+        if not 0 <= i < self.count:
+            raise IndexError(i)
+        return HEADER.size + i * self.record.size
+
+    def append(self, games) -> None:
+        """Snapshot each of the games at the end of the file."""
+        games = list(games)
+        size = HEADER.size + (self.count + len(games)) * self.record.size
+        if size > len(self.mmap):
+            # grow at least geometrically so appending one game at a time stays cheap
+            self.mmap.resize(max(size, 2 * len(self.mmap)))
+        offset = HEADER.size + self.count * self.record.size
+        for game in games:
+            game.snapshot_into(self.mmap, offset)
+            offset += self.record.size
+        self.count += len(games)
+
+    def write(self, i, game) -> None:
+        game.snapshot_into(self.mmap, self.offset(i))
+
+    def read(self, i, board=None, clock=None):
+        return Game.from_snapshot(self.mmap, self.offset(i), board, clock)
+
+    def raw(self, i) -> memoryview:
+        """Bytes of record i without decoding them."""
+        offset = self.offset(i)
+        return memoryview(self.mmap)[offset:offset + self.record.size]
+
+    def __iter__(self):
+        for i in range(self.count):
+            yield self.read(i)
+
+    def close(self) -> None:
+        HEADER.pack_into(self.mmap, 0, MAGIC, VERSION, self.width, self.height, self.count)
+        self.mmap.flush()
+        self.mmap.close()
+        self.file.truncate(HEADER.size + self.count * self.record.size)
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build a dataset of positions from games played at random.")
+    parser.add_argument('file')
+    parser.add_argument('--games', type=int, default=100)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    rng = random.Random(args.seed)
+    with SnapshotFile(args.file, create=True) as snapshots:
+        for i in range(args.games):
+            game = Game(BitBoard(), args.seed + i, record=False)
+            while game.going:
+                snapshots.append([game])
+                for action in [Action.MoveLeft if rng.random() < 0.5 else Action.MoveRight] * rng.randrange(5):
+                    game.apply(action)
+                game.apply(Action.HardDrop)
+                game.apply(Action.Lock)
+        count = len(snapshots)
+    print("{} positions, {} bytes in {:.2f}s".format(count, os.path.getsize(args.file), time.perf_counter() - start))
+
+if __name__ == '__main__':
+    sys.exit(main())
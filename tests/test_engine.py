@@ -0,0 +1,29 @@
+from engine import BitBoard, CellBoard, Game, TickClock
+
+def play_at_level(board, level, frames):
+    """Let gravity play a game at a fixed level, returning the frames the piece overlapped the stack."""
+    game = Game(board, seed=0, record=False, clock=TickClock())
+    game.level = level
+    game.time_constant = (0.8 - ((level - 1) * 0.007)) ** (level - 1)
+    overlaps = 0
+    for i in range(frames):
+        if not game.going:
+            break
+        game.update([])
+        piece = game.current_piece
+        if game.going and piece.check_intersection(piece.position, game.board):
+            overlaps += 1
+    return game, overlaps
+
+def test_gravity_faster_than_lock_delay_still_locks():
+    # from level 4 on a drop takes less than the lock delay
+    for board in (CellBoard(), BitBoard()):
+        game, overlaps = play_at_level(board, 4, 5000)
+        assert game.time_constant < game.lock_delay
+        assert overlaps == 0
+        assert game.pieces > 5
+
+def test_game_ends_when_the_first_piece_does_not_fit():
+    for width in (1, 2):
+        game = Game(CellBoard(width, 20), seed=0, record=False, clock=TickClock())
+        assert not game.going
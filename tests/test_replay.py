@@ -0,0 +1,20 @@
+import random
+from engine import BitBoard, CellBoard, Game, TickClock
+from replay import Replay
+
+def play(game, rng, frames):
+    for i in range(frames):
+        if not game.going:
+            break
+        game.update([rng.randrange(1, 8)] if rng.random() < 0.2 else [])
+    return game
+
+def test_recorded_games_replay_to_the_same_end():
+    for seed in range(10):
+        for board_type in (CellBoard, BitBoard):
+            randomizer = 'bag' if seed % 2 else 'random'
+            game = play(Game(board_type(), seed, randomizer, clock=TickClock()), random.Random(seed), 20000)
+            replay = Replay.from_bytes(Replay.from_game(game).to_bytes())
+            replayed = replay.run(board_type())
+            assert replayed.board.row_bits() == game.board.row_bits()
+            assert (replayed.score, replayed.lines, replayed.pieces) == (game.score, game.lines, game.pieces)
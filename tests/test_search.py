@@ -0,0 +1,40 @@
+import random
+from collections import deque
+from engine import BitBoard, Tetromino, row_masks
+from search import placements
+
+def reachable(board, block_type, position):
+    """Resting cells of every state reachable one move, turn or row at a time with Tetromino."""
+    masks = row_masks(board.width)[block_type]
+    seen = {(0, position)}
+    queue = deque(seen)
+    found = set()
+    while queue:
+        angle, (x, y) = queue.popleft()
+        moves = [(angle, (x - 1, y)), (angle, (x + 1, y)), (angle, (x, y + 1))]
+        if board.intersects(block_type, angle, (x, y + 1)):
+            found.add(tuple((y + dy, mask) for dy, mask in masks[angle][x]))
+        for turn in (Tetromino.try_turn_clockwise, Tetromino.try_turn_counterclockwise):
+            piece = Tetromino(block_type, (x, y), angle)
+            if turn(piece, board):
+                moves.append((piece.angle, piece.position))
+        for state in moves:
+            if state not in seen and not board.intersects(block_type, state[0], state[1]):
+                seen.add(state)
+                queue.append(state)
+    return found
+
+def test_placements_match_step_by_step_search():
+    rng = random.Random(0)
+    for i in range(100):
+        board = BitBoard()
+        heights = [rng.randrange(15) for x in range(board.width)]
+        for y in range(board.height):
+            for x in range(board.width):
+                if board.height - y <= heights[x] and rng.random() < 0.8:
+                    board.rows[y] |= 1 << x
+            if board.rows[y] == board.full:
+                board.rows[y] &= ~(1 << rng.randrange(board.width))
+        block_type = rng.randrange(1, 8)
+        found = {placement.rows for placement in placements(board.rows, block_type, (4, -1))}
+        assert found == reachable(board, block_type, (4, -1))
@@ -0,0 +1,31 @@
+import random
+from engine import Action, BitBoard, CellBoard, Game, TickClock
+
+def play(game, rng, frames):
+    for i in range(frames):
+        if not game.going:
+            break
+        game.update([rng.randrange(1, 8)] if rng.random() < 0.2 else [])
+
+def test_snapshot_round_trip_on_a_tall_wide_board():
+    # piece rows past 127 and widths past 255 need more than a byte
+    for board_type in (CellBoard, BitBoard):
+        game = Game(board_type(300, 200), seed=1, record=False, clock=TickClock())
+        game.apply(Action.HardDrop)
+        assert game.current_piece.position[1] > 127
+        data = game.snapshot()
+        restored = Game.from_snapshot(data, board=board_type(300, 200), clock=TickClock())
+        assert restored.current_piece.position == game.current_piece.position
+        assert restored.snapshot() == data
+
+def test_restored_and_cloned_games_continue_like_the_original():
+    for seed in range(5):
+        for board_type in (CellBoard, BitBoard):
+            game = Game(board_type(), seed, 'bag' if seed % 2 else 'random', record=False, clock=TickClock())
+            play(game, random.Random(seed), 1000)
+            restored = Game.from_snapshot(game.snapshot(), board=board_type(), clock=TickClock())
+            clone = game.clone()
+            for other in (game, restored, clone):
+                play(other, random.Random(-seed), 3000)
+            assert restored.snapshot() == game.snapshot()
+            assert clone.snapshot() == game.snapshot()
@@ -1,229 +1,101 @@
 #!/bin/env python3
 # https://tetris.fandom.com/wiki/Tetris_Guideline
-import pygame
-# import pygame_gui
-import random
+import sys
 import time
+STARTED = time.perf_counter()
+
+import argparse
+# pygame imports numpy for surfarray and setuptools for pkgdata, neither of
+# which the game uses, and they take most of its import time; hide them while
+# pygame loads unless something has already imported them
+_skipped = [name for name in ('numpy', 'pkg_resources') if name not in sys.modules]
+for name in _skipped:
+    sys.modules[name] = None
+try:
+    import pygame
+finally:
+    for name in _skipped:
+        if sys.modules.get(name, 0) is None:
+            del sys.modules[name]
+# import pygame_gui
 from pygame.locals import *
-
-class BlockType:
-    Empty = 0
-    I = 1
-    O = 2
-    T = 3
-    S = 4
-    Z = 5
-    J = 6
-    L = 7
-
-class Tetromino:
-    block_type: BlockType
-    position = (0, 0)
-    angle = 0
-    lock_start = 0
-    last_move_time = 0
-    last_drop_time = 0
-
-    def __init__(self, block_type, position) -> None:
-        self.block_type = block_type
-        self.position = position
-        self.rotations = {
-            BlockType.I: {
-                0: 0b0000111100000000,
-                1: 0b0010001000100010,
-                2: 0b0000000011110000,
-                3: 0b0100010001000100},
-            BlockType.O: {
-                0: 0b1111,
-                1: 0b1111,
-                2: 0b1111,
-                3: 0b1111},
-            BlockType.T: {
-                0: 0b010111000,
-                1: 0b010011010,
-                2: 0b000111010,
-                3: 0b010110010},
-            BlockType.S: {
-                0: 0b011110000,
-                1: 0b010011001,
-                2: 0b000011110,
-                3: 0b100110010},
-            BlockType.Z: {
-                0: 0b110011000,
-                1: 0b001011010,
-                2: 0b000110011,
-                3: 0b010110100},
-            BlockType.J: {
-                0: 0b100111000,
-                1: 0b011010010,
-                2: 0b000111001,
-                3: 0b010010110},
-            BlockType.L: {
-                0: 0b001111000,
-                1: 0b010010011,
-                2: 0b000111100,
-                3: 0b110010010}}
-        self.last_drop_time = time.time()
-
-    def drop(self) -> None:
-        self.position = (self.position[0], self.position[1] + 1)
-        self.last_drop_time = time.time()
-
-    def try_turn_clockwise(self, cells):
-        if self.block_type == BlockType.I:
-            rules = [[(0, 0), (-2, 0), (1, 0), (-2, -1), (1, 2)],
- 	                 [(0, 0), (-1, 0), (2, 0), (-1, 2), (2, -1)],
- 	                 [(0, 0), (2, 0), (-1, 0), (2, 1), (-1, -2)],
- 	                 [(0, 0), (1, 0), (-2, 0), (1, -2), (-2, 1)]]
-        else:
-            rules = [[(0, 0), (-1, 0), (-1, 1),(0, -2), (-1, -2)],
-                     [(0, 0), (1, 0), (1, -1), (0, 2), (1, 2)],
-                     [(0, 0), (1, 0), (1, 1), (0, -2), (1, -2)],
-                     [(0, 0), (-1, 0), (-1, -1), (0, 2), (-1, 2)]]
-        for r in rules[self.angle]:
-            # subtract rules position because playfield is reversed
-            pos = (self.position[0] - r[0], self.position[1] - r[1])
-            if not self.check_intersection(pos, cells, self.turn_clockwise()):
-                self.position = pos
-                self.angle = self.turn_clockwise()
-                return True
-        return False
-
-    def try_turn_counterclockwise(self, cells):
-        if self.block_type == BlockType.I:
-            rules = [
-                [(0, 0), (-1, 0), (2, 0), (-1, 2), ( 2, -1)],
-                [(0, 0), (2, 0), (-1, 0), (2, 1), (-1, -2)],
- 	            [(0, 0), (1, 0), (-2, 0), (1, -2), (-2, 1)],
- 	            [(0, 0), (-2, 0), (1, 0), (-2, -1), (1, 2)]]
-        else:
-            rules = [
-                [(0, 0), (1, 0), (1, 1), (0, -2), (1, -2)],
-                [(0, 0), (1, 0), (1, -1), (0, 2), (1, 2)],
-                [(0, 0), (-1, 0), (-1, 1), (0, -2), (-1, -2)],
-                [(0, 0), (-1, 0), (-1,-1), (0, 2), (-1, 2)]]
-        for r in rules[self.angle]:
-            # subtract rules position because playfield is reversed
-            pos = (self.position[0] - r[0], self.position[1] - r[1])
-            if not self.check_intersection(pos, cells, self.turn_counterclockwise()):
-                self.position = pos
-                self.angle = self.turn_counterclockwise()
-                return True
-        return False
-
-    def turn_clockwise(self, angle=None) -> None:
-        if angle is None:
-            angle = self.angle
-        angle += 1
-        if angle == 4:
-            angle = 0
-        return angle
-
-    def turn_counterclockwise(self, angle=None) -> None:
-        if angle is None:
-            angle = self.angle
-        angle -= 1
-        if angle == -1:
-            angle = 3
-        return angle
-
-    def move_left(self):
-        self.position = (self.position[0] - 1, self.position[1])
-
-    def move_right(self):
-        self.position = (self.position[0] + 1, self.position[1])
-
-    def get_bb_dim(self):
-        if self.block_type == BlockType.I:
-            return (4, 4)
-        elif self.block_type == BlockType.O:
-            return (2, 2)
-        else:
-            return (3, 3)
-
-    def int_repr(self) -> int:
-        return self.rotations[self.block_type][self.angle]
-
-    def check_grounded(self, playfield):
-        d = self.get_bb_dim()
-        for y in range(d[1]):
-            for x in range(d[0]):
-                if (self.int_repr() >> ((d[1] - y - 1) * d[0] + d[0] - x - 1)) & 1:
-                    if (y + self.position[1] + 1 == 20
-                        or playfield[y + self.position[1] + 1][x + self.position[0]] != BlockType.Empty):
-                        self.lock_start = time.time()
-                        self.last_drop_time = time.time()
-                        return
-        self.lock_start = 0
-
-    def check_intersection(self, position, playfield, angle=None):
-        d = self.get_bb_dim()
-        if angle is None:
-            angle = self.angle
-        r = self.rotations[self.block_type][angle]
-        for y in range(d[1]):
-            for x in range(d[0]):
-                if (r >> ((d[1] - y - 1) * d[0] + d[0] - x - 1)) & 1:
-                    if x + position[0] < 0 or x + position[0] > 9 or y + position[1] > 19:
-                        return True
-                    elif y + position[1] < 0:
-                        continue
-                    elif playfield[y + position[1]][x + position[0]] != BlockType.Empty:
-                        return True
-        return False
+from engine import Action, BlockType, CellBoard, Game, RANDOMIZERS, SEED_LIMIT
+from profiler import PHASES, FrameProfiler, NullProfiler, StartupTimer
+from replay import Replay
+
+KEY_ACTIONS = {
+    K_LEFT: Action.RotateClockwise,
+    K_q: Action.RotateClockwise,
+    K_RIGHT: Action.RotateCounterclockwise,
+    K_e: Action.RotateCounterclockwise,
+    K_a: Action.MoveLeft,
+    K_d: Action.MoveRight,
+    K_s: Action.SoftDrop,
+    K_DOWN: Action.SoftDrop,
+    K_SPACE: Action.HardDrop,
+    K_TAB: Action.Hold,
+}
+
+BLOCK_COLORS = {
+    BlockType.I: (0, 200, 200),
+    BlockType.O: (200, 200, 0),
+    BlockType.T: (200, 0, 200),
+    BlockType.S: (0, 200, 0),
+    BlockType.Z: (200, 0, 0),
+    BlockType.J: (80, 80, 200),
+    BlockType.L: (200, 100, 0),
+    BlockType.Garbage: (120, 120, 120),
+}
+# atlas slot of the ghost, after the block types
+SHADOW = BlockType.Garbage + 1
 
 class Playfield:
-    width: int = 10
-    height: int = 20
-
-    level: int = 1
-    score: int = 0
-    current_level_score: int = 0
-    going = True
-    ghost_position = (0, 0)
-    line_clear_start = 0
-    held_piece = None
-    can_hold = True
-    time_constant = 1.0
-
     cell_dim = (30, 30)
 
-    def __init__(self) -> None:
-        self.cells = [[None] * self.width for i in range(self.height)]
-        for y in range(len(self.cells)):
-            for x in range(len(self.cells[0])):
-                self.cells[y][x] = 0
-
-        self.block_sprites = {
-            BlockType.I: Playfield.create_block_sprite(self.cell_dim, 3, (0, 200, 200)),
-            BlockType.O: Playfield.create_block_sprite(self.cell_dim, 3, (200, 200, 0)),
-            BlockType.T: Playfield.create_block_sprite(self.cell_dim, 3, (200, 0, 200)),
-            BlockType.S: Playfield.create_block_sprite(self.cell_dim, 3, (0, 200, 0)),
-            BlockType.Z: Playfield.create_block_sprite(self.cell_dim, 3, (200, 0, 0)),
-            BlockType.J: Playfield.create_block_sprite(self.cell_dim, 3, (80, 80, 200)),
-            BlockType.L: Playfield.create_block_sprite(self.cell_dim, 3, (200, 100, 0))
-        }
-
-        self.block_sprites[BlockType.Empty] = pygame.Surface(self.cell_dim)
-        self.block_sprites[BlockType.Empty].fill((32, 32, 32))
-        pygame.draw.rect(self.block_sprites[BlockType.Empty],
-                         (16, 16, 16),
-                         pygame.Rect((0, 0), self.cell_dim),
-                         width=1)
-
-        self.shadow = pygame.Surface(self.cell_dim)
-        self.shadow.fill((32, 32, 32))
-        pygame.draw.rect(self.shadow, (64, 64, 64), (0, 0, 30, 30), width=2)
-
-        self.current_piece = Tetromino(random.randrange(1, 8), (self.width // 2 - 1, 0))
-        self.next_piece = Tetromino(random.randrange(1, 8), (self.width // 2 - 1, 0))
-        self.ghost_position = self.calc_ghost()
-
-        self.surface = pygame.Surface((self.cell_dim[0]*10, self.cell_dim[1]*20))
-        self.hold_surface = pygame.Surface((self.cell_dim[0]*4, self.cell_dim[1]*4))
-        self.next_surface = pygame.Surface((self.cell_dim[0]*4, self.cell_dim[1]*4))
+    def __init__(self, game=None, cell_size=30) -> None:
+        self.game = game if game is not None else Game()
+        self.cell_dim = (cell_size, cell_size)
+        # every sprite stacked in one surface, slot i at y = i * cell height; a
+        # column blits several times faster than a row of sprites
+        self.atlas = pygame.Surface((self.cell_dim[0], self.cell_dim[1] * (SHADOW + 1)))
+        self.atlas_areas = [pygame.Rect(0, self.cell_dim[1] * i, self.cell_dim[0], self.cell_dim[1])
+                            for i in range(SHADOW + 1)]
+        for block_type, color in BLOCK_COLORS.items():
+            self.atlas.blit(Playfield.create_block_sprite(self.cell_dim, max(1, cell_size // 10), color),
+                            self.atlas_areas[block_type])
+        empty = self.atlas.subsurface(self.atlas_areas[BlockType.Empty])
+        empty.fill((32, 32, 32))
+        pygame.draw.rect(empty, (16, 16, 16), pygame.Rect((0, 0), self.cell_dim), width=1)
+        shadow = self.atlas.subsurface(self.atlas_areas[SHADOW])
+        shadow.fill((32, 32, 32))
+        pygame.draw.rect(shadow, (64, 64, 64), pygame.Rect((0, 0), self.cell_dim), width=2)
+        # rendered next and hold previews by (block type, angle)
+        self.previews = {}
+
+        self.surface = pygame.Surface((self.cell_dim[0]*self.game.width, self.cell_dim[1]*self.game.height))
+        if pygame.display.get_surface() is not None:
+            # match the display's pixel format so blits take the fast path
+            self.atlas = self.atlas.convert()
+            self.surface = self.surface.convert()
+        self.hold_surface = self.preview(None)
+        self.next_surface = self.preview(None)
+        self.invalidate()
         self.repaint()
 
+    def invalidate(self) -> None:
+        """Forget what has been drawn so the next repaint redraws everything."""
+        self.drawn_cells = [[None] * self.game.width for y in range(self.game.height)]
+        self.drawn_board = None
+        self.drawn_changes = None
+        self.drawn_piece = None
+        self.piece_cells = set()
+        self.ghost_cells = set()
+        self.drawn_next = None
+        self.drawn_hold = -1
+        self.next_changed = False
+        self.hold_changed = False
+
+    @staticmethod
     def create_block_sprite(dim, v, color) -> pygame.Surface:
         lighter_color = [min(255, color[i] + 64) for i in range(3)]
         lightest_color = [min(255, color[i] + 96) for i in range(3)]
@@ -247,222 +119,313 @@ class Playfield:
                                                    (dim[0], dim[1])])
         return block
 
-    def transfer_piece(self):
-        d = self.current_piece.get_bb_dim()
-        pos = self.current_piece.position
-        for y in range(d[1]):
-            for x in range(d[0]):
-                if (self.current_piece.int_repr() >> ((d[1] - y - 1) * d[0] + d[0] - x - 1)) & 1:
-                    self.cells[y + pos[1]][x + pos[0]] = self.current_piece.block_type
-
-    def calc_ghost(self):
-        for y in range(self.current_piece.position[1], self.height):
-            if self.current_piece.check_intersection((self.current_piece.position[0],
-                                                      y + 1),
-                                                     self.cells):
-                return (self.current_piece.position[0], y)
-        return self.current_piece.position
-
-    def clear_lines(self) -> None:
-        for y in range(self.height-1, 0, -1):
-            combo = 0
-            while sum([1 for c in self.cells[y] if c != BlockType.Empty]) == self.width:
-                combo += 1
-                for i in range(y, 0, -1):
-                    self.cells[i][:] = self.cells[i-1][:]
-                self.cells[0] = [BlockType.Empty for x in range(self.width)]
-
-            self.score += [0, 1, 3, 5, 8][combo]
-            self.current_level_score += [0, 1, 3, 5, 8][combo]
-
-        if self.current_level_score > (10 * self.level) and self.level < 20:
-            self.level += 1
-            self.current_level_score = 0
-            self.time_constant = (0.8 - ((self.level - 1) * 0.007)) ** (self.level - 1)
-
-    def add_next_piece(self):
-        self.current_piece = self.next_piece
-        self.next_piece = Tetromino(random.randrange(1, 8), (self.width // 2 - 1, -1))
-
-    def hold_piece(self):
-        if self.held_piece:
-            tmp = Tetromino(self.current_piece.block_type, (self.width // 2 - 1, -1))
-            self.current_piece = self.held_piece
-            self.held_piece = tmp
-        else:
-            self.held_piece = Tetromino(self.current_piece.block_type, (self.width // 2 - 1, -1))
-            self.add_next_piece()
-        self.can_hold = False
-
     def update(self, events) -> bool:
-        if not self.going:
-            return False
-        for event in events:
-            if event.type == KEYDOWN:
-                if event.key == K_LEFT or event.key == K_q:
-                    if self.current_piece.try_turn_clockwise(self.cells):
-                        self.ghost_position = self.calc_ghost()
-                        self.current_piece.check_grounded(self.cells)
-                elif event.key == K_RIGHT or event.key == K_e:
-                    if self.current_piece.try_turn_counterclockwise(self.cells):
-                        self.ghost_position = self.calc_ghost()
-                        self.current_piece.check_grounded(self.cells)
-                elif event.key == K_a:
-                    if not self.current_piece.check_intersection((self.current_piece.position[0] - 1,
-                                                                  self.current_piece.position[1]),
-                                                                 self.cells):
-                        self.current_piece.move_left()
-                        self.ghost_position = self.calc_ghost()
-                        self.current_piece.check_grounded(self.cells)
-                elif event.key == K_d:
-                    if not self.current_piece.check_intersection((self.current_piece.position[0] + 1,
-                                                                  self.current_piece.position[1]),
-                                                                 self.cells):
-                        self.current_piece.move_right()
-                        self.ghost_position = self.calc_ghost()
-                        self.current_piece.check_grounded(self.cells)
-                elif event.key == K_s or event.key == K_DOWN:
-                    if not self.current_piece.check_intersection((self.current_piece.position[0],
-                                                                  self.current_piece.position[1] + 1),
-                                                                 self.cells):
-                        self.current_piece.drop()
-                        self.ghost_position = self.calc_ghost()
-                        self.current_piece.check_grounded(self.cells)
-
-                elif event.key == K_SPACE:
-                    for y in range(self.height):
-                        if not self.current_piece.check_intersection((self.current_piece.position[0],
-                                                                      self.current_piece.position[1] + 1),
-                                                                     self.cells):
-                            self.current_piece.drop()
-                            self.ghost_position = self.calc_ghost()
-                            self.current_piece.check_grounded(self.cells)
-                            self.current_piece.last_drop_time = time.time()
-                        else:
-                            break
-                elif event.key == K_TAB and self.can_hold:
-                    self.hold_piece()
-
-        if self.current_piece.lock_start > 0 and time.time() - self.current_piece.lock_start > 0.5:
-            self.transfer_piece()
-            self.clear_lines()
-            self.add_next_piece()
-            self.can_hold = True
-            self.ghost_position = self.calc_ghost()
-            if not self.current_piece.check_intersection((self.current_piece.position[0],
-                                                          self.current_piece.position[1] + 1),
-                                                         self.cells):
-                self.current_piece.drop()
-                self.current_piece.check_grounded(self.cells)
+        actions = [KEY_ACTIONS[event.key] for event in events
+                   if event.type == KEYDOWN and event.key in KEY_ACTIONS]
+        return self.game.update(actions)
+
+    def board_cells(self, piece, position) -> set:
+        return {(x + position[0], y + position[1]) for x, y in piece.cells()
+                if 0 <= y + position[1] < self.game.height}
+
+    def repaint(self) -> list:
+        """Redraw what changed since the last call and return the dirty rects of self.surface."""
+        game = self.game
+        piece = game.current_piece
+        dirty = set()
+        # stationary blocks, only compared when the board changed
+        if game.board is not self.drawn_board or game.board.changes != self.drawn_changes:
+            for y, row in enumerate(game.board.cells):
+                drawn = self.drawn_cells[y]
+                if row != drawn:
+                    for x in range(len(row)):
+                        if row[x] != drawn[x]:
+                            dirty.add((x, y))
+                    self.drawn_cells[y] = row[:]
+            self.drawn_board = game.board
+            self.drawn_changes = game.board.changes
+
+        # ghost and current piece
+        piece_state = (piece.block_type, piece.angle, piece.position, game.ghost_position)
+        if piece_state != self.drawn_piece:
+            dirty |= self.piece_cells | self.ghost_cells
+            self.piece_cells = self.board_cells(piece, piece.position)
+            self.ghost_cells = self.board_cells(piece, game.ghost_position)
+            dirty |= self.piece_cells | self.ghost_cells
+            self.drawn_piece = piece_state
+
+        blits = []
+        areas = self.atlas_areas
+        # leftmost and rightmost dirty column of each row
+        spans = {}
+        for x, y in dirty:
+            rect = pygame.Rect(self.cell_dim[0] * x, self.cell_dim[1] * y, self.cell_dim[0], self.cell_dim[1])
+            if (x, y) in self.piece_cells:
+                area = areas[piece.block_type]
+            elif (x, y) in self.ghost_cells:
+                area = areas[SHADOW]
             else:
-                self.going = False
-        elif time.time() - self.current_piece.last_drop_time > self.time_constant:
-            self.current_piece.drop()
-            self.ghost_position = self.calc_ghost()
-            self.current_piece.check_grounded(self.cells)
-        # TODO: only do if there were changes
-        self.repaint()
-        return True
-
-    def repaint(self) -> None:
-        # draw stationary blocks
-        for y in range(len(self.cells)):
-            for x in range(len(self.cells[y])):
-               self.surface.blit(self.block_sprites[self.cells[y][x]],
-                                 (self.cell_dim[0] * x,
-                                  self.cell_dim[1] * y,
-                                  self.cell_dim[0],
-                                  self.cell_dim[1]))
-
-        d = self.current_piece.get_bb_dim()
-        # draw ghost
-        for y in range(d[1]):
-            for x in range(d[0]):
-                if (self.current_piece.int_repr() >> ((d[1] - y - 1) * d[0] + d[0] - x - 1)) & 0b1:
-                    self.surface.blit(self.shadow,
-                                      (self.cell_dim[0] * (x + self.ghost_position[0]),
-                                       self.cell_dim[1] * (y + self.ghost_position[1]),
-                                       self.cell_dim[0],
-                                       self.cell_dim[1]))
-
-        # draw current piece
-        for y in range(d[1]):
-            for x in range(d[0]):
-                if (self.current_piece.int_repr() >> ((d[1] - y - 1) * d[0] + d[0] - x - 1)) & 0b1:
-                    self.surface.blit(self.block_sprites[self.current_piece.block_type],
-                                      (self.cell_dim[0] * (x + self.current_piece.position[0]),
-                                       self.cell_dim[1] * (y + self.current_piece.position[1]),
-                                       self.cell_dim[0],
-                                       self.cell_dim[1]))
-        # draw next piece
-        d = self.next_piece.get_bb_dim()
-        self.next_surface.fill((64, 64, 64))
-        for y in range(d[1]):
-            for x in range(d[0]):
-                if (self.next_piece.int_repr() >> ((d[1] - y - 1) * d[0] + d[0] - x - 1)) & 0b1:
-                    self.next_surface.blit(self.block_sprites[self.next_piece.block_type],
-                                           (self.cell_dim[0] * x, self.cell_dim[1] * y))
-        # draw hold
-        if self.held_piece is not None:
-            d = self.held_piece.get_bb_dim()
-            self.hold_surface.fill((64, 64, 64))
-            for y in range(d[1]):
-                for x in range(d[0]):
-                    if (self.held_piece.int_repr() >> ((d[1] - y - 1) * d[0] + d[0] - x - 1)) & 0b1:
-                        self.hold_surface.blit(self.block_sprites[self.held_piece.block_type],
-                                               (self.cell_dim[0] * x, self.cell_dim[1] * y))
+                area = areas[game.board.cells[y][x]]
+            blits.append((self.atlas, rect, area))
+            left, right = spans.get(y, (x, x))
+            spans[y] = (min(left, x), max(right, x))
+        if blits:
+            self.surface.blits(blits, doreturn=False)
+        rects = [pygame.Rect(self.cell_dim[0] * left, self.cell_dim[1] * y,
+                             self.cell_dim[0] * (right - left + 1), self.cell_dim[1])
+                 for y, (left, right) in spans.items()]
+
+        # next and hold previews
+        self.next_changed = game.next_piece.block_type != self.drawn_next
+        if self.next_changed:
+            self.next_surface = self.preview(game.next_piece)
+            self.drawn_next = game.next_piece.block_type
+        held = game.held_piece.block_type if game.held_piece is not None else None
+        self.hold_changed = held != self.drawn_hold
+        if self.hold_changed:
+            self.hold_surface = self.preview(game.held_piece)
+            self.drawn_hold = held
+        return rects
+
+    def preview(self, piece) -> pygame.Surface:
+        """Surface showing a piece in a 4x4 box, rendered once per block type and angle."""
+        key = (piece.block_type, piece.angle) if piece is not None else None
+        surface = self.previews.get(key)
+        if surface is None:
+            surface = pygame.Surface((self.cell_dim[0]*4, self.cell_dim[1]*4))
+            surface.fill((64, 64, 64))
+            if piece is not None:
+                surface.blits([(self.atlas, (self.cell_dim[0] * x, self.cell_dim[1] * y),
+                                self.atlas_areas[piece.block_type]) for x, y in piece.cells()],
+                              doreturn=False)
+            if pygame.display.get_surface() is not None:
+                surface = surface.convert()
+            self.previews[key] = surface
+        return surface
+
+class CachedText:
+    """Text label that is only re-rendered when its value changes."""
+
+    def __init__(self, font, position, color=(255, 255, 255), background=(64, 64, 64)) -> None:
+        self.font = font
+        self.position = position
+        self.color = color
+        self.background = background
+        self.value = None
+        self.surface = None
+        self.rect = pygame.Rect(position, (0, 0))
+
+    def draw(self, screen, value, force=False):
+        """Draw the label if needed and return the dirty rect, or None if nothing changed."""
+        if value == self.value and not force:
+            return None
+        if value != self.value:
+            self.value = value
+            self.surface = self.font.render("{}".format(value), True, self.color)
+        old_rect = self.rect
+        screen.fill(self.background, old_rect)
+        self.rect = screen.blit(self.surface, self.position)
+        return self.rect.union(old_rect)
+
+class ProfileOverlay:
+    """Frame time percentiles and dropped frames of a FrameProfiler, refreshed twice a second."""
+
+    def __init__(self, profiler, rect, background=(64, 64, 64), interval=500) -> None:
+        self.profiler = profiler
+        self.rect = pygame.Rect(rect)
+        self.background = background
+        self.interval = interval
+        self.font = pygame.font.Font(None, 20)
+        self.next_draw = 0
+
+    def draw(self, screen, force=False):
+        """Draw the stats if they are due and return the dirty rect, or None."""
+        now = pygame.time.get_ticks()
+        if now < self.next_draw and not force:
+            return None
+        self.next_draw = now + self.interval
+        screen.fill(self.background, self.rect)
+        p50, p99 = self.profiler.percentiles()
+        lines = ["frame {:.1f} / {:.1f} ms".format(p50 * 1000, p99 * 1000),
+                 "dropped {} of {}".format(self.profiler.dropped, self.profiler.frames)]
+        for phase in PHASES:
+            p50, p99 = self.profiler.percentiles(phase)
+            lines.append("{} {:.2f} / {:.2f}".format(phase, p50 * 1000, p99 * 1000))
+        y = self.rect.top
+        for line in lines:
+            screen.blit(self.font.render(line, True, (200, 200, 200)), (self.rect.left, y))
+            y += self.font.get_linesize()
+        return self.rect
+
+def seed_arg(text) -> int:
+    seed = int(text)
+    if not 0 <= seed < SEED_LIMIT:
+        raise argparse.ArgumentTypeError("seeds are from 0 to 2**64 - 1")
+    return seed
+
+def board_size(text) -> int:
+    # the I piece is four cells long
+    size = int(text)
+    if size < 4:
+        raise argparse.ArgumentTypeError("boards are at least 4 cells wide and high")
+    return size
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Play tetris.")
+    parser.add_argument('--seed', type=seed_arg, help="seed of the piece sequence")
+    parser.add_argument('--randomizer', choices=sorted(RANDOMIZERS), default='random')
+    parser.add_argument('--record', metavar='FILE', help="save the input log of the game to FILE")
+    parser.add_argument('--profile', action='store_true',
+                        help="time each phase of the main loop and show p50 / p99 ms on screen")
+    parser.add_argument('--profile-output', metavar='FILE',
+                        help="save the frame times to FILE, a Chrome trace for .json and CSV otherwise")
+    parser.add_argument('--events', metavar='TARGET',
+                        help="stream game events to a file, or a unix:PATH or tcp:HOST:PORT socket")
+    parser.add_argument('--width', type=board_size, default=10, help="board width in cells, at least 4")
+    parser.add_argument('--height', type=board_size, default=20, help="board height in cells, at least 4")
+    parser.add_argument('--cell-size', type=int, help="cell size in pixels, by default the largest up to 30 that fits")
+    parser.add_argument('--startup-times', action='store_true',
+                        help="print how long each step before the first frame took")
+    args = parser.parse_args(argv)
+    startup = StartupTimer(STARTED)
+    startup.mark('import')
+
+    # only what the game uses, pygame.init() would also start audio and joysticks
+    pygame.display.init()
+    pygame.font.init()
+    startup.mark('init')
+    cell = args.cell_size
+    if cell is None:
+        info = pygame.display.Info()
+        cell = 30
+        if info.current_w > 0 and info.current_h > 0:
+            cell = max(2, min(cell, (info.current_h - 80) // args.height, (info.current_w - 232) // args.width))
+    # the board with a border, then a column with the previews and scores
+    board_origin = (20, 20)
+    panel = board_origin[0] + cell * args.width + 20
+    preview = 4 * cell
+    score_y = 80 + preview
+    hold_y = score_y + 120
+    overlay_rect = pygame.Rect(panel, hold_y + preview + 20, 172, 170)
+    screen = pygame.display.set_mode([panel + 172, max(640, cell * args.height + 40, overlay_rect.bottom)])
+    startup.mark('window')
+    running = True
+    clock = pygame.time.Clock()
+    font = pygame.font.Font('assets/KrabbyPatty.ttf', 32)
+    score_label = font.render('Score', True, (255, 127, 0))
+    level_label = font.render('Level', True, (255, 127, 0))
+    next_piece_label = font.render('Next', True, (255, 127, 0))
+    hold_piece_label = font.render('Hold', True, (255, 127, 0))
+    # rendered at game over
+    you_died_sprite = None
+    if args.events:
+        # sockets and threads are only loaded when logging
+        from events import open_sink
+        sink = open_sink(args.events)
+    else:
+        sink = None
+    playfield = Playfield(Game(CellBoard(args.width, args.height), args.seed, args.randomizer, listener=sink), cell)
+    score_value_label = CachedText(font, (panel + 100, score_y))
+    level_value_label = CachedText(font, (panel + 100, score_y + 40))
+    if args.profile or args.profile_output:
+        profiler = FrameProfiler()
+        overlay = ProfileOverlay(profiler, overlay_rect) if args.profile else None
+    else:
+        profiler = NullProfiler()
+        overlay = None
+    startup.mark('assets')
+
+    def draw_static():
+        screen.fill((64, 64, 64))
+        pygame.draw.rect(screen, (255, 255, 255),
+                         playfield.surface.get_rect(topleft=board_origin).inflate(6, 6), width=3)
+        screen.blit(next_piece_label, (panel, 20))
+        screen.blit(score_label, (panel, score_y))
+        screen.blit(level_label, (panel, score_y + 40))
+        screen.blit(hold_piece_label, (panel, score_y + 80))
+        playfield.invalidate()
+
+    draw_static()
+    full_redraw = True
+    game_over_drawn = False
+    while running:
+        profiler.start_frame()
+        if playfield.game.going:
+            events = pygame.event.get()
         else:
-            self.hold_surface.fill((64, 64, 64))
-
-pygame.init()
-screen = pygame.display.set_mode([512, 640])
-running = True
-clock = pygame.time.Clock()
-font = pygame.font.Font('assets/KrabbyPatty.ttf', 32)
-score_label = font.render('Score', True, (255, 127, 0))
-level_label = font.render('Level', True, (255, 127, 0))
-next_piece_label = font.render('Next', True, (255, 127, 0))
-hold_piece_label = font.render('Hold', True, (255, 127, 0))
-you_died = font.render('YOU DIED', True, (255, 0, 0))
-you_died_sprite = pygame.Surface((screen.get_size()[0], 100))
-you_died_sprite.blit(you_died, ((you_died_sprite.get_size()[0] - you_died.get_size()[0]) // 2,
-                                (you_died_sprite.get_size()[1] - you_died.get_size()[1]) // 2))
-playfield = Playfield()
-while running:
-    events = pygame.event.get()
-    for event in events:
-        if event.type == KEYDOWN:
-            if event.key == K_ESCAPE:
+            # nothing animates after game over, sleep until there is input
+            events = [pygame.event.wait()]
+            profiler.mark('sleep')
+        for event in events:
+            if event.type == KEYDOWN:
+                if event.key == K_ESCAPE:
+                    running = False
+            elif event.type == pygame.QUIT:
                 running = False
-        elif event.type == pygame.QUIT:
-            running = False
-
-    playfield.update(events)
-
-    score_value_label = font.render("{}".format(playfield.score), True, (255, 255, 255))
-    level_value_label = font.render("{}".format(playfield.level), True, (255, 255, 255))
-
-    screen.fill((64, 64, 64))
-    pygame.draw.rect(screen, (255, 255, 255), (17, 17, 306, 606), width=3)
-    screen.blit(playfield.surface, pygame.Rect((20, 20), playfield.surface.get_size()))
-
-    screen.blit(next_piece_label, (340, 20))
-    screen.blit(playfield.next_surface, (340, 60))
-
-    screen.blit(score_label, (340, 200))
-    screen.blit(score_value_label, (440, 200))
-
-    screen.blit(level_label, (340, 240))
-    screen.blit(level_value_label, (440, 240))
-
-    screen.blit(hold_piece_label, (340, 280))
-    screen.blit(playfield.hold_surface, (340, 320))
-
-    if not playfield.going:
-        screen.blit(you_died_sprite, ((screen.get_size()[0] - you_died_sprite.get_size()[0]) // 2,
-                                      (screen.get_size()[1] - you_died_sprite.get_size()[1]) // 2))
-
-    pygame.display.flip()
-    clock.tick(60)
-
-pygame.quit()
+            elif event.type in (VIDEOEXPOSE, WINDOWEXPOSED):
+                draw_static()
+                full_redraw = True
+                game_over_drawn = False
+
+        profiler.mark('events')
+        playfield.update(events)
+        profiler.mark('update')
+
+        rects = []
+        for rect in playfield.repaint():
+            rects.append(screen.blit(playfield.surface, rect.move(board_origin), rect))
+        if playfield.next_changed:
+            rects.append(screen.blit(playfield.next_surface, (panel, 60)))
+        if playfield.hold_changed:
+            rects.append(screen.blit(playfield.hold_surface, (panel, hold_y)))
+        profiler.mark('repaint')
+
+        for label, value in ((score_value_label, playfield.game.score),
+                             (level_value_label, playfield.game.level)):
+            rect = label.draw(screen, value, force=full_redraw)
+            if rect is not None:
+                rects.append(rect)
+
+        if not playfield.game.going and not game_over_drawn:
+            if you_died_sprite is None:
+                you_died = font.render('YOU DIED', True, (255, 0, 0))
+                you_died_sprite = pygame.Surface((screen.get_size()[0], 100))
+                you_died_sprite.blit(you_died, ((you_died_sprite.get_size()[0] - you_died.get_size()[0]) // 2,
+                                                (you_died_sprite.get_size()[1] - you_died.get_size()[1]) // 2))
+            rects.append(screen.blit(you_died_sprite,
+                                     ((screen.get_size()[0] - you_died_sprite.get_size()[0]) // 2,
+                                      (screen.get_size()[1] - you_died_sprite.get_size()[1]) // 2)))
+            game_over_drawn = True
+        profiler.mark('hud')
+
+        if overlay is not None:
+            rect = overlay.draw(screen, force=full_redraw)
+            if rect is not None:
+                rects.append(rect)
+        profiler.mark('overlay')
+
+        if full_redraw:
+            pygame.display.flip()
+            full_redraw = False
+        elif rects:
+            pygame.display.update(rects)
+        profiler.mark('display')
+        if args.startup_times and startup.steps[-1][0] != 'first frame':
+            startup.mark('first frame')
+            print(startup.report())
+        clock.tick(60)
+        profiler.mark('sleep')
+        profiler.end_frame()
+
+    pygame.quit()
+    if sink is not None:
+        sink.close()
+    if args.profile_output:
+        profiler.write(args.profile_output)
+        print("saved {} frames to {}".format(len(profiler.recorded()), args.profile_output))
+    if args.record:
+        Replay.from_game(playfield.game).save(args.record)
+        print("recorded seed {} to {}".format(playfield.game.seed, args.record))
+
+if __name__ == '__main__':
+    main()